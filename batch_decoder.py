@@ -0,0 +1,105 @@
+import queue
+import threading
+import time
+import numpy as np
+from frame_source import make_source
+
+
+class BatchDecoder:
+    """
+    Decodes a clip on a background thread into batches of consecutive frames.
+
+    The frames are read straight into a few preallocated (batch_size, height, width, 3)
+    buffers: the decoder fills one while the consumer runs the network on another, and
+    get() hands the batches out in clip order. A batch must be handed back with release()
+    once its frames are no longer needed.
+    """
+
+    def __init__(self, source, batch_size=8, prefetch=2):
+        self.source = make_source(source, realtime=False)
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.free = queue.Queue()
+        self.ready = queue.Queue(maxsize=prefetch)
+        self.stopped = threading.Event()
+        self.thread = None
+        self.frames = 0
+        self.decode_ns = 0
+        self.wait_ns = 0
+
+    def start(self) -> bool:
+        """
+        Method that opens the clip and starts decoding.
+
+        :return: bool: False if the clip cannot be read
+        """
+        if not self.source.open():
+            return False
+        width, height = self.source.size
+        for _ in range(self.prefetch + 1):
+            self.free.put(np.empty((self.batch_size, height, width, 3), np.uint8))
+        self.thread = threading.Thread(target=self.decode, daemon=True)
+        self.thread.start()
+        return True
+
+    def decode(self) -> None:
+        """
+        Method run by the decoder thread until the end of the clip.
+
+        :return: None
+        """
+        start = 0
+        try:
+            while not self.stopped.is_set():
+                buf = self.free.get()
+                if self.stopped.is_set(): break
+                t0 = time.perf_counter_ns()
+                n = 0
+                while n < self.batch_size:
+                    ok, frame = self.source.read(buf[n])
+                    if not ok: break
+                    if not np.may_share_memory(frame, buf[n]):
+                        buf[n] = frame
+                    n += 1
+                self.decode_ns += time.perf_counter_ns() - t0
+                if n == 0: break
+                self.ready.put((start, buf, n))
+                start += n
+                self.frames += n
+                if n < self.batch_size: break
+        finally:
+            self.source.release()
+            self.ready.put(None)
+
+    def get(self):
+        """
+        Method that waits for the next batch.
+
+        :return: tuple: (index of its first frame in the clip, buffer, frames) with the frames in buffer[:frames]; None at the end of the clip
+        """
+        t0 = time.perf_counter_ns()
+        batch = self.ready.get()
+        self.wait_ns += time.perf_counter_ns() - t0
+        return batch
+
+    def release(self, buf) -> None:
+        self.free.put(buf)
+
+    def close(self) -> None:
+        self.stopped.set()
+        if self.thread is None: return
+        # unblock the decoder if it waits for a free buffer or for room in the ready queue
+        self.free.put(np.empty((self.batch_size, 0, 0, 3), np.uint8))
+        while self.thread.is_alive():
+            try:
+                self.ready.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self.thread.join()
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "decode_s": round(self.decode_ns / 1e9, 3),
+            "wait_s": round(self.wait_ns / 1e9, 3),
+        }
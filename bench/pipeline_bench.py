@@ -0,0 +1,211 @@
+"""
+End-to-end throughput benchmark of the CameraManager recording pipeline.
+
+Every case records from a SyntheticSource in its own process, so the peak RSS of one
+case does not leak into the next, and reports capture/encode fps, end-to-end latency
+percentiles, dropped frames, bytes per frame, CPU seconds per stage, per-stage timings
+and peak RSS.
+
+    python -m bench.pipeline_bench -o results.json
+    python -m bench.pipeline_bench --resolution 1080p --codec mp4v MJPG --baseline results.json --threshold 10
+    python -m bench.pipeline_bench --codec x264 ffv1 raw --preset ultrafast veryfast
+
+With --baseline the run exits with status 1 when a metric regresses by more than
+--threshold percent against the case with the same configuration in the baseline file.
+"""
+import argparse
+import itertools
+import json
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import cv2
+import numpy as np
+from camera import CameraManager
+from frame_source import SyntheticSource
+from encoders import CODECS, PRESETS
+from events import FRAME_WRITTEN
+
+RESOLUTIONS = {
+    "480p": (640, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160),
+}
+
+# metric -> True when higher is better
+METRICS = {
+    "capture_fps": True,
+    "encode_fps": True,
+    "bytes_per_frame": False,
+    "latency_p50_ms": False,
+    "latency_p95_ms": False,
+    "latency_p99_ms": False,
+    "drop_rate": False,
+    "peak_rss_mb": False,
+}
+
+
+def run_case(config) -> dict:
+    """
+    Method that records with one configuration and measures the pipeline.
+
+    :return: dict: the metrics of the case
+    """
+    width, height = RESOLUTIONS[config["resolution"]]
+    source = SyntheticSource(width, height, config["fps"], config["pattern"], realtime=not config["max_speed"])
+    latencies = []
+
+    with tempfile.TemporaryDirectory() as path:
+        cm = CameraManager(path, config["n_loop"], config["duration"], 0, source, fps=config["fps"],
+                           scale=config["scale"], queue_size=config["queue_size"], backpressure=config["backpressure"],
+                           codec=config["codec"], preset=config["preset"], encode_process=config["encode_process"])
+        cm.events.subscribe(FRAME_WRITTEN, lambda timestamp: latencies.append(time.monotonic_ns() - timestamp), sync=True)
+
+        cm.start_camera()
+        cm.wait_ready()
+        # timed from the first frame, the source start-up is not part of the pipeline
+        start = time.perf_counter()
+        read_before = cm.metrics.frames_read
+        cm.start_recording()
+        if config["n_loop"] == -1:
+            time.sleep(config["duration"] * 2)
+        else:
+            cm.wait_recording_done(config["n_loop"] * (config["duration"] + 1) + 10)
+        capture_elapsed = time.perf_counter() - start
+        captured = cm.metrics.frames_read - read_before
+        # the encoder thread is joined here, once the queued frames are written
+        cm.close_camera()
+        elapsed = time.perf_counter() - start
+
+    stats = cm.stats()
+    written = stats["frames_written"]
+    dropped = stats["frames_dropped"]
+    latencies = np.asarray(latencies) / 1e6 if latencies else np.zeros(1)
+    # ffmpeg and --encode-process encode in child processes, count their CPU as encoding too
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    encode_cpu = cm.cpu_times.get("encode", 0.0) + children.ru_utime + children.ru_stime
+    return {
+        "capture_fps": round(captured / capture_elapsed, 2),
+        "encode_fps": round(written / elapsed, 2),
+        "bytes_per_frame": round(stats["bytes_written"] / written) if written else 0,
+        "frames_captured": captured,
+        "frames_written": written,
+        "frames_dropped": dropped,
+        "drop_rate": round(dropped / max(dropped + written, 1), 4),
+        "latency_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "latency_p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "latency_p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "cpu_capture_s": round(cm.cpu_times.get("capture", 0.0), 3),
+        "cpu_encode_s": round(encode_cpu, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "elapsed_s": round(elapsed, 3),
+        "stages": stats["stages"],
+    }
+
+
+def case_key(config) -> str:
+    return json.dumps(config, sort_keys=True)
+
+
+def find_regressions(results, baseline, threshold) -> list:
+    """
+    Method that compares the results with a baseline run.
+
+    :return: list: a description of every metric that regressed by more than threshold percent
+    """
+    previous = {case_key(case["config"]): case["metrics"] for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        old = previous.get(case_key(case["config"]))
+        if old is None: continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = old.get(metric), case["metrics"].get(metric)
+            if before is None or after is None: continue
+            if metric == "drop_rate":
+                # rates start at zero, compare them in percentage points
+                change = (after - before) * 100
+            elif before == 0:
+                continue
+            else:
+                change = (after - before) / before * 100
+            if higher_is_better: change = -change
+            if change > threshold:
+                regressions.append(f"{case['config']} {metric}: {before} -> {after} ({change:+.1f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CameraManager pipeline on synthetic frames.")
+    parser.add_argument("--resolution", nargs="+", choices=tuple(RESOLUTIONS), default=["720p", "1080p"])
+    parser.add_argument("--scale", type=float, nargs="+", default=[0.5])
+    parser.add_argument("--fps", type=float, nargs="+", default=[30.0])
+    parser.add_argument("--codec", nargs="+", choices=tuple(CODECS), default=["mp4v"])
+    parser.add_argument("--preset", nargs="+", choices=PRESETS, default=["veryfast"],
+                        help="x264 presets to sweep, ignored by the other codecs")
+    parser.add_argument("--n-loop", dest="n_loop", type=int, nargs="+", default=[1])
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per clip")
+    parser.add_argument("--pattern", choices=SyntheticSource.PATTERNS, default="gradient")
+    parser.add_argument("--queue-size", dest="queue_size", type=int, default=32)
+    parser.add_argument("--backpressure", default="block")
+    parser.add_argument("--encode-process", dest="encode_process", action="store_true",
+                        help="Encode in a separate process fed through shared memory")
+    parser.add_argument("--max-speed", dest="max_speed", action="store_true",
+                        help="Generate frames as fast as possible instead of at the target fps")
+    parser.add_argument("-o", dest="output", type=str, default=None, help="Write the JSON results to this file")
+    parser.add_argument("--baseline", type=str, default=None, help="JSON results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    codecs = []
+    for codec in args.codec:
+        if CODECS[codec][0] == "ffmpeg" and shutil.which("ffmpeg") is None:
+            print(f"Skipping {codec}: ffmpeg is not on the PATH", file=sys.stderr)
+            continue
+        codecs += [(codec, preset) for preset in args.preset] if codec == "x264" else [(codec, "")]
+
+    configs = [
+        {
+            "resolution": resolution, "scale": scale, "fps": fps, "codec": codec, "preset": preset,
+            "n_loop": n_loop, "duration": args.duration, "pattern": args.pattern, "queue_size": args.queue_size,
+            "backpressure": args.backpressure, "max_speed": args.max_speed, "encode_process": args.encode_process,
+        }
+        for resolution, scale, fps, (codec, preset), n_loop
+        in itertools.product(args.resolution, args.scale, args.fps, codecs, args.n_loop)
+    ]
+
+    results = {
+        "meta": {"python": platform.python_version(), "opencv": cv2.__version__, "machine": platform.machine()},
+        "cases": [],
+    }
+    context = multiprocessing.get_context("spawn")
+    for config in configs:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            metrics = pool.submit(run_case, config).result()
+        results["cases"].append({"config": config, "metrics": metrics})
+        print(json.dumps(config, sort_keys=True), file=sys.stderr)
+        print("    " + json.dumps(metrics), file=sys.stderr)
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print("REGRESSION " + regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
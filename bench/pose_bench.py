@@ -0,0 +1,58 @@
+"""
+Throughput of the pose backends and of the pose writers on synthetic frames, no camera needed.
+
+Run from the repository root:
+
+    python -m bench.pose_bench
+    python -m bench.pose_bench --backend opencv --model pose.onnx --frames 200
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from pose_estimators import BACKENDS, open_estimator
+from pose_output import FORMATS, open_pose_writer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pose extraction and pose output.")
+    parser.add_argument("--backend", choices=BACKENDS, default="stub")
+    parser.add_argument("--model", type=str, default=None, help="ONNX model of the opencv backend")
+    parser.add_argument("--format", choices=tuple(FORMATS), default="npy")
+    parser.add_argument("--size", type=str, default="1280x720", help="Frame size WxH")
+    parser.add_argument("--frames", type=int, default=1000, help="Number of timed frames")
+    args = parser.parse_args()
+
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(4)]
+    estimator = open_estimator(args.backend, threshold=0.15, model=args.model)
+    estimator.process(frames[0].copy(), "none")  # warm up
+
+    with tempfile.TemporaryDirectory() as path:
+        writer = open_pose_writer(os.path.join(path, f"pose.{args.format}"), estimator.keypoints, args.format)
+        infer_ns = write_ns = rows = 0
+        for i in range(args.frames):
+            t0 = time.perf_counter_ns()
+            keypoints = estimator.process(frames[i % len(frames)], "none")
+            t1 = time.perf_counter_ns()
+            writer.extend(i, keypoints["person"], keypoints["keypoint"], keypoints["x"], keypoints["y"], keypoints["confidence"])
+            writer.tick()
+            t2 = time.perf_counter_ns()
+            infer_ns += t1 - t0
+            write_ns += t2 - t1
+            rows += len(keypoints)
+        t0 = time.perf_counter_ns()
+        writer.close()
+        write_ns += time.perf_counter_ns() - t0
+
+    total_s = (infer_ns + write_ns) / 1e9
+    print(f"{args.backend} {width}x{height}, {args.frames} frames, {rows} keypoints")
+    print(f"inference {infer_ns / args.frames / 1000:>10.1f} us/frame")
+    print(f"{args.format:<9} {write_ns / args.frames / 1000:>10.1f} us/frame")
+    print(f"total     {args.frames / total_s:>10.1f} frames/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Micro-benchmark of the FramePlan transform strategies on synthetic frames.
+
+Run from the repository root:
+
+    python -m bench.transform_bench
+    python -m bench.transform_bench --scale 0.25 --frames 500
+"""
+import argparse
+import time
+import numpy as np
+from transform import FramePlan, INTERPOLATIONS, STRATEGIES, AUTO, DECIMATE, DECIMATION_STEPS
+
+RESOLUTIONS = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "4K": (3840, 2160),
+}
+
+
+def time_strategy(frames, scale, interpolation, strategy, n_frames) -> float:
+    """
+    Method that runs one strategy over the synthetic frames.
+
+    :return: float: the mean time per frame in microseconds
+    """
+    height, width = frames[0].shape[:2]
+    plan = FramePlan((width, height), scale, interpolation=interpolation, strategy=strategy)
+    for frame in frames:
+        plan.apply(frame)  # warm up caches and OpenCV thread pools
+
+    start = time.perf_counter_ns()
+    for i in range(n_frames):
+        plan.apply(frames[i % len(frames)])
+    return (time.perf_counter_ns() - start) / n_frames / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the flip+resize strategies of FramePlan.")
+    parser.add_argument("--resolution", nargs="+", choices=tuple(RESOLUTIONS), default=list(RESOLUTIONS))
+    parser.add_argument("--scale", type=float, nargs="+", default=[0.5])
+    parser.add_argument("--interpolation", nargs="+", choices=tuple(INTERPOLATIONS), default=list(INTERPOLATIONS))
+    parser.add_argument("--frames", type=int, default=200, help="Number of timed frames per case")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'resolution':<10} {'scale':>5} {'interpolation':<13} {'strategy':<12} {'us/frame':>10}")
+    for name in args.resolution:
+        width, height = RESOLUTIONS[name]
+        # a few distinct frames so the source does not stay hot in the cache
+        frames = [rng.integers(0, 256, (height, width, 3), dtype=np.uint8) for _ in range(4)]
+        for scale in args.scale:
+            for interpolation in args.interpolation:
+                for strategy in STRATEGIES:
+                    if strategy == AUTO: continue
+                    if strategy == DECIMATE and (scale not in DECIMATION_STEPS or interpolation != "nearest"): continue
+                    us = time_strategy(frames, scale, interpolation, strategy, args.frames)
+                    print(f"{name:<10} {scale:>5} {interpolation:<13} {strategy:<12} {us:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
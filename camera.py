@@ -1,221 +1,515 @@
-import tkinter as tk
 import time
-import argparse
 import os
-import cv2
+import json
 from icecream import ic
-import guis
-import guil
 import threading
+from functools import partial
+from frame_queue import FrameQueue
+from transform import FramePlan
+from frame_source import make_source
+from metrics import Metrics, StatsReporter
+from segments import Clip, SegmentedRecorder
+from preroll import PrerollBuffer
+from encoders import open_encoder, codec_extension, check_codec
+from shm_encoder import EncodeProcess, ProcessEncoder
+from events import EventBus, START, STOP, ERROR, FRAME_READY, FRAME_WRITTEN, CLIP_CLOSED
+from events import COUNTDOWN as COUNTDOWN_EVENT
+from recording_state import RecordingState, IDLE, PREVIEW, COUNTDOWN, RECORDING, ROTATING, STOPPING
+from collections import deque
+import re
+from output_index import OutputIndex, DEFAULT_TEMPLATE
+
+# requests queued for the camera worker
+RECORD = "record"
+STOP_RECORDING = "stop_recording"
+CLOSE = "close"
 
 class CameraManager:
-    def __init__(self, path="./", n_loop=1, vid_dur=10, countdown=0, cam=0, debug=False, fps=16.0, scale=0.5):
+    def __init__(self, path="./", n_loop=1, vid_dur=10, countdown=0, cam=0, debug=False, fps=16.0, scale=0.5,
+                 queue_size=32, backpressure="block", interpolation="linear", transform="auto",
+                 realtime=True, metrics=True, stats_interval=0.0, clip_frames=0,
+                 preroll=0.0, preroll_max_mb=256, codec="mp4v", preset="veryfast",
+                 encode_process=False, name_template=DEFAULT_TEMPLATE):
         self.debug = debug
         self.path = path
-        self.ext = "mp4"
+        self.codec = codec
+        self.preset = preset
+        self.encode_process = encode_process
+        self.encode_processes = {}
+        self.encode_lock = threading.Lock()
         self.n_loop = n_loop
         self.duration = vid_dur
+        self.clip_frames = clip_frames
         self.countdown = countdown
         self.camera = cam
-        self.index = 0 
+        self.name_template = name_template
+        self.output_index = None
 
-        self.on_start = None
-        self.on_stop = None
-        self.on_error = None
-        self.on_countdown = None
-        self.on_frame_ready = None
+        # subscribe with self.events.subscribe(events.FRAME_READY, handler), see events.py
+        self.events = EventBus()
 
         self.vid = None
         self.writer = None
+        self.plan = None
+        self.prefix = "output"
+        self.manifest = "manifest.jsonl"
+        self.schedule = None
+        self.clip_index = 0
 
         self.camera_thread = None
-
-        self.camera_control = 0
-
-        self.finished = False
-        self.recording = False
-        self.recording_time = 0.0
+        self.encoder_thread = None
+        self.cpu_times = {}
+
+        self.metrics = Metrics(metrics)
+        self.stats_interval = stats_interval
+        self.reporter = None
+
+        self.queue_size = queue_size
+        self.backpressure = backpressure
+        self.frame_queue = FrameQueue(queue_size, backpressure)
+
+        self.state = RecordingState()
+        self.commands = deque()
+        self.ready = threading.Event()
+        self.started_ns = None
+        self.first_frame_ns = None
+
+        self.recording_start = None
+        self.countdown_left = 0
+        self.countdown_end = 0
+        self.clip_queued = 0
+        self.preroll = PrerollBuffer(preroll, fps, preroll_max_mb * 1024 * 1024)
+        self.clock_offset_ns = time.time_ns() - time.monotonic_ns()
         self.fps = fps
         self.scale = scale
-
-    def looping_cam(self) -> None:
-        """
-        Method that loops the camera opening.
-
-        :return: None
-        """
-        
-        if self.n_loop != -1:
-            for i in range(self.n_loop):
-                if self.recording: self.count_down()
-                self.open_camera()
-                ic('looping_cam:loop_n','self.camera_control',self.camera_control)
-                if self.camera_control == -1: break
-                if self.camera_control == 0: self.camera_control = 1
-        else:
-            while True:
-                if self.recording: self.count_down()
-                self.open_camera()
-                ic('looping_cam:forever','self.camera_control',self.camera_control)
-                if self.camera_control == 0: self.camera_control = 1
-                if self.camera_control == -1: break
-        self.did_stop()
+        self.interpolation = interpolation
+        self.transform = transform
+        self.realtime = realtime
 
     def start_camera(self):
         self.close_camera()
-        self.finished = False
-        self.camera_control = 1
-        #self.camera_thread = threading.Thread(target=self.looping_cam)
+        self.clock_offset_ns = time.time_ns() - time.monotonic_ns()
+        self.frame_queue = FrameQueue(self.queue_size, self.backpressure)
+        self.metrics = Metrics(self.metrics.enabled)
+        self.commands.clear()
+        self.ready.clear()
+        self.started_ns = time.monotonic_ns()
+        self.first_frame_ns = None
+        if self.stats_interval > 0:
+            self.reporter = StatsReporter(self.stats, self.stats_interval)
+            self.reporter.start()
+        self.state.transition(PREVIEW, time.monotonic_ns())
+        self.encoder_thread = threading.Thread(target=self.encode_frames)
+        self.encoder_thread.start()
         self.camera_thread = threading.Thread(target=self.open_camera)
         self.camera_thread.start()
 
+    def start_recording(self) -> bool:
+        """
+        Method that asks the camera worker to start recording, after the countdown if there is one.
+        The request is applied between two frames, no thread is started.
 
-    def start_recording(self):
-        if self.vid is None or not self.vid.isOpened():
+        :return: bool: False if the codec cannot be used, the error is reported through did_error
+        """
+        try:
+            check_codec(self.codec)
+        except (RuntimeError, ValueError, OSError) as e:
+            self.did_error(f"Error: Could not open the video writer: {e}")
+            return False
+        if self.state.current == IDLE:
             self.start_camera()
-        
-        t=threading.Thread(target=self.start_recording_thread)
-        t.start()
+        self.commands.append((RECORD, time.monotonic_ns()))
+        return True
 
-        
-
-    def start_recording_thread(self):
-        t=threading.Thread(target=self.count_down)
-        t.start()
-        frame_width = int(self.vid.get(cv2.CAP_PROP_FRAME_WIDTH)) * self.scale
-        frame_height = int(self.vid.get(cv2.CAP_PROP_FRAME_HEIGHT)) * self.scale
-        size = (int(frame_width), int(frame_height))
-        self.writer = cv2.VideoWriter(
-            filename=self.get_next_filename(),
-            fourcc=cv2.VideoWriter_fourcc(*'mp4v'),
-            fps=self.fps, 
-            frameSize=size
-        )
-        t.join()
-        self.recording_time = time.time() + 0.1
-        self.recording = True
-        
-        
-        
- 
     def stop_recording(self):
-        self.recording = False
-        if self.writer is not None:
-            self.writer.release()
-            self.writer = None
+        self.commands.append((STOP_RECORDING, time.monotonic_ns()))
+
+    def open_camera(self) -> None:
+        """
+        Method run by the camera worker: opens the source, then captures, previews and queues
+        the frames for the encoder thread until the camera is closed or the source ends.
+        Start/stop requests and clip rotations are applied by this thread between two frames.
 
-    def open_camera(self) -> int:
+        :return: None
         """
-        Method that opens the camera and displays the feed until the escape button is pressed.
-        This method also saves the video streamed into a file with the specified extension.
 
-        :return: int: 1 if 'q' key was pressed, 2 if 'ESC' key was pressed, otherwise 0
+        try:
+            if self.vid is not None:
+                self.vid.release()
+                self.vid = None
+
+            self.vid = make_source(self.camera, self.fps, self.realtime)
+
+            if not self.vid.open():
+                self.did_error("Error: Could not open video device.")
+                return
+
+            self.plan = FramePlan(self.vid.size, self.scale, interpolation=self.interpolation, flip=1, strategy=self.transform)
+
+            while self.vid.is_opened():
+                t0 = time.perf_counter_ns()
+                ret, frame = self.vid.read(self.plan.frame)
+                timestamp = time.monotonic_ns()
+                t1 = time.perf_counter_ns()
+                if not ret:
+                    self.did_error("Error: Failed to capture image")
+                    break
+                if self.first_frame_ns is None:
+                    self.first_frame_ns = timestamp
+                    self.ready.set()
+                frame = self.transform_frame(frame)
+                t2 = time.perf_counter_ns()
+                self.did_frame_ready(frame)
+                self.metrics.record_capture(t0, t1, t2, time.perf_counter_ns())
+
+                if self.commands: self.run_commands()
+                state = self.state.current
+                if state == STOPPING: break
+                if state == COUNTDOWN: self.tick_countdown(timestamp)
+                self.record_frame(frame, timestamp)
+        except Exception as e:
+            # without did_stop the encoder thread and every waiter would block forever
+            self.did_error(f"Error: The camera worker failed: {e!r}")
+        finally:
+            self.cpu_times["capture"] = time.thread_time()
+            self.did_stop()
+
+    def run_commands(self) -> None:
         """
+        Method that applies the requests queued by start_recording, stop_recording and close_camera.
+        The deque is the only thing shared with the requesting threads, append and popleft are atomic.
 
-        if self.vid is not None:
-            self.vid.release()
-            self.vid = None 
+        :return: None
+        """
+        while True:
+            try:
+                command, requested_ns = self.commands.popleft()
+            except IndexError:
+                break
+            if command == CLOSE:
+                self.end_clip()
+                self.state.transition(STOPPING, requested_ns)
+            elif command == STOP_RECORDING:
+                if self.state.current in (COUNTDOWN, RECORDING):
+                    self.end_clip()
+                    self.state.transition(PREVIEW, requested_ns)
+            elif command == RECORD and self.state.current == PREVIEW:
+                self.begin_clip(requested_ns)
+
+    def begin_clip(self, requested_ns) -> None:
+        try:
+            if self.n_loop == -1 and self.schedule is not None:
+                # looping forever on a shared schedule: segments cut on its grid
+                self.writer = SegmentedRecorder(self.open_clip, 0, self.schedule.period_ns,
+                                                origin_ns=self.schedule.origin_ns, preopen_frames=int(self.fps))
+            elif self.n_loop == -1:
+                # looping forever: rotate without stopping, see SegmentedRecorder
+                self.writer = SegmentedRecorder(self.open_clip, self.clip_frames, int(self.duration * 1e9),
+                                                preopen_frames=int(self.fps))
+            else:
+                # opened by the encoder thread with the first frame
+                self.writer = self.new_clip()
+        except (RuntimeError, ValueError, OSError) as e:
+            self.did_error(f"Error: Could not open the video writer: {e}")
+            self.state.transition(PREVIEW, requested_ns)
+            return
+        self.recording_start = None
+        self.clip_queued = 0
+        self.countdown_left = self.countdown
+        self.countdown_end = time.monotonic_ns() + int(self.countdown * 1e9)
+        if self.countdown > 0:
+            self.state.transition(COUNTDOWN, requested_ns)
+            self.did_countdown(self.countdown)
+        else:
+            self.state.transition(RECORDING, requested_ns)
+            self.did_start()
+
+    def tick_countdown(self, timestamp) -> None:
+        """
+        Method that advances the countdown on the frame clock, the capture never waits for it.
+
+        :return: None
+        """
+        left = -((timestamp - self.countdown_end) // 1_000_000_000)
+        if left <= 0:
+            self.state.transition(RECORDING, self.countdown_end)
+            self.did_start()
+        elif left < self.countdown_left:
+            self.countdown_left = left
+            self.did_countdown(left)
+
+    def record_frame(self, frame, timestamp) -> None:
+        writer = self.writer
+        start = self.schedule.start(self.clip_index) if self.schedule is not None else timestamp
+        if self.state.current != RECORDING or writer is None or timestamp < start:
+            if self.preroll.enabled: self.preroll.push(frame, timestamp)
+            return
+
+        if self.recording_start is None:
+            self.recording_start = self.flush_preroll(writer, start)
+        elif not isinstance(writer, SegmentedRecorder) and self.clip_complete(timestamp):
+            # cut before queueing, like SegmentedRecorder: this frame is the first of the next clip
+            self.rotate()
+            self.record_frame(frame, timestamp)
+            return
+        if self.frame_queue.put(frame, (timestamp, writer)):
+            self.clip_queued += 1
+
+    def rotate(self) -> None:
+        """
+        Method that ends a finished clip and starts the next one, or goes back to the preview after the last one.
+
+        :return: None
+        """
+        started = time.monotonic_ns()
+        self.state.transition(ROTATING)
+        self.end_clip()
+        self.clip_index += 1
+        if self.n_loop > 0:
+            self.n_loop -= 1
+        if self.debug: ic(self.n_loop)
+        if self.n_loop != 0:
+            self.begin_clip(started)
+        else:
+            self.state.transition(PREVIEW, started)
+
+    def end_clip(self) -> None:
+        if self.writer is None: return
+        # the encoder thread closes the writer once the frames queued before this point are written
+        self.frame_queue.put_marker(self.writer.close)
+        self.writer = None
 
-        self.vid = cv2.VideoCapture(self.camera, cv2.CAP_DSHOW)
-        self.vid.set(cv2.CAP_PROP_FPS, self.fps)
+    def flush_preroll(self, writer, timestamp) -> int:
+        """
+        Method that queues the pre-roll frames ahead of the first recorded frame. The pre-roll
+        comes on top of the clip length, which is still counted from the trigger. A ring that is
+        still draining belongs to the previous clip and is left alone.
 
-        if not self.vid.isOpened():
-            self.did_error("Error: Could not open video device.")
-            return 0
+        :return: int: the timestamp the clip length is counted from
+        """
+        if self.preroll.count == 0 or self.preroll.draining.is_set(): return timestamp
+        self.preroll.begin_drain()
+        self.frame_queue.put_marker(partial(self.write_preroll, writer))
+        return timestamp
+
+    def write_preroll(self, writer) -> None:
+        for frame, timestamp in self.preroll.drain():
+            t0 = time.perf_counter_ns()
+            writer.write(frame, timestamp)
+            self.metrics.record_write(t0, time.perf_counter_ns())
+            self.did_frame_written(timestamp)
+
+    def clip_complete(self, timestamp) -> bool:
+        """
+        Method that tells whether the current clip has reached its length, counted in frames
+        when clip_frames is set and in monotonic time otherwise, so NTP steps cannot stretch a clip.
+        It is asked before queueing a frame, a frame at or past the end goes to the next clip.
+        With a dropping backpressure policy the count is of the frames handed to the queue.
+        A camera following a ClipSchedule cuts its clips when the next one is due instead.
 
+        :return: bool: True if the clip is complete
+        """
+        if self.schedule is not None:
+            return timestamp >= self.schedule.start(self.clip_index + 1)
+        if self.clip_frames > 0:
+            return self.clip_queued >= self.clip_frames
+        return timestamp - self.recording_start >= self.duration * 1e9
 
+    def encode_frames(self) -> None:
+        """
+        Method that drains the frame queue into the video writers, running on its own thread
+        so a slow encode never stalls the capture loop.
 
-        #self.recording_time = time.time()
-        while self.vid.isOpened():
-            #ic('open_cam','self.camera_control',self.camera_control)
-            ret, frame = self.vid.read()
-            if not ret:
-                self.did_error("Error: Failed to capture image")
-                break
-            frame = self.transform_frame(frame)
-            self.did_frame_ready(frame)
+        :return: None
+        """
+        while True:
+            item = self.frame_queue.get()
+            if item is None: break
+            slot, frame, meta = item
+            try:
+                if frame is None:
+                    meta()
+                else:
+                    timestamp, writer = meta
+                    t0 = time.perf_counter_ns()
+                    writer.write(frame, timestamp)
+                    self.metrics.record_write(t0, time.perf_counter_ns())
+                    self.did_frame_written(timestamp)
+            except Exception as e:
+                # keep draining, a dead encoder thread would block the capture forever
+                self.did_error(f"Error: Failed to write frame: {e}")
+            self.frame_queue.release(slot)
+        self.cpu_times["encode"] = time.thread_time()
+
+
+    def new_clip(self) -> Clip:
+        """
+        Method that names the next output file, its writer is opened by the first write.
+
+        :return: Clip: the clip, not opened yet
+        """
+        filename = self.get_next_filename()
+        opener = partial(self.open_writer, filename, self.plan.size, self.plan.out.shape)
+        return Clip(None, filename, self.clip_closed, opener=opener, index=self.clip_index)
 
+    def open_clip(self) -> Clip:
+        """
+        Method that opens the writer of the next output file.
 
-            if self.camera_control != 1: break 
+        :return: Clip: the clip wrapping the writer
+        """
+        clip = self.new_clip()
+        clip.open()
+        return clip
 
-            if self.recording: 
-                self.writer.write(frame)
+    def open_writer(self, filename, size, frame_shape):
+        if self.encode_process:
+            process = self.get_encode_process(frame_shape)
+            return ProcessEncoder(process, filename, self.fps, size, self.codec, self.preset)
+        return open_encoder(filename, self.fps, size, self.codec, self.preset)
 
-                if time.time() - self.recording_time < self.duration: continue
-                self.stop_recording()
-                ic(self.n_loop) # new
-                
-                if self.n_loop > 0:
-                    self.n_loop -= 1
-                    
-                if self.n_loop > 0:
-                    self.start_recording()
-                elif self.n_loop == -1:
-                    self.start_recording()
-                
-                        
+    def get_encode_process(self, frame_shape) -> EncodeProcess:
+        """
+        Method that returns the encoder process for a frame shape, starting it on first use
+        or when the previous one has died.
 
-        self.did_stop()
+        :return: EncodeProcess: the process whose shared ring holds frames of that shape
+        """
+        with self.encode_lock:
+            process = self.encode_processes.get(frame_shape)
+            if process is not None and not process.is_alive():
+                # the worker died, its clips have failed, the next ones go to a new one
+                process.stop()
+                process = None
+            if process is None:
+                process = self.encode_processes[frame_shape] = EncodeProcess(frame_shape)
+            return process
+
+    def stop_encode_processes(self) -> None:
+        with self.encode_lock:
+            for process in self.encode_processes.values():
+                process.stop()
+            self.encode_processes = {}
+
+    def clip_closed(self, clip) -> None:
+        """
+        Method called once a clip file is complete, it updates the counters and appends the clip to the manifest.
 
+        :return: None
+        """
+        self.metrics.files_rotated += 1
+        if os.path.exists(clip.filename):
+            self.metrics.bytes_written += os.path.getsize(clip.filename)
+        entry = clip.entry()
+        if clip.start is not None:
+            entry["wall_start"] = (clip.start + self.clock_offset_ns) / 1e9
+        with open(os.path.join(self.path, self.manifest), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        self.did_clip_closed(clip)
 
     def transform_frame(self,frame):
+        """
+        Method that flips and scales a captured frame using the precomputed frame plan.
+        The plan is rebuilt only when the scale or the size delivered by the device changes.
+
+        :return: the transformed frame, its buffer is reused for the next frame so copy it to keep it
+        """
         #frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        frame_width = int(self.vid.get(cv2.CAP_PROP_FRAME_WIDTH)) * self.scale
-        frame_height = int(self.vid.get(cv2.CAP_PROP_FRAME_HEIGHT)) * self.scale
-        size = (int(frame_width), int(frame_height))
-        frame = cv2.flip(frame, 1)  # Flip horizontally to correct inversion
-        frame = cv2.resize(frame, size)
-        return frame
+        if self.plan is None or not self.plan.matches(frame, self.scale):
+            self.plan = FramePlan((frame.shape[1], frame.shape[0]), self.scale,
+                                  interpolation=self.interpolation, flip=1, strategy=self.transform)
+        return self.plan.apply(frame)
+
+    def stats(self) -> dict:
+        """
+        Method that returns a snapshot of the pipeline counters and of the per-stage timings.
+
+        :return: dict: frames read/written/dropped/queued, files rotated, bytes written, queue depth, pre-roll memory, stage histograms, event delivery and state transition latencies
+        """
+        stats = self.metrics.snapshot()
+        stats["frames_dropped"] = self.frame_queue.dropped
+        stats["frames_queued"] = self.frame_queue.queued
+        stats["queue_depth"] = len(self.frame_queue)
+        stats["queue_high_water"] = self.frame_queue.high_water
+        stats.update(self.preroll.stats())
+        stats["events"] = self.events.stats()
+        stats["state"] = self.state.current
+        stats["startup_ms"] = self.startup_ms()
+        stats["transitions"] = self.state.stats()
+        return stats
 
     def is_running(self):
-        return not self.finished
+        return self.state.current != IDLE
     
     def is_recording(self):
-        return not self.recording
+        return self.state.current in (COUNTDOWN, RECORDING, ROTATING)
+
+
+    def wait_ready(self, timeout=None) -> bool:
+        """
+        Method that waits for the first frame of the source.
+
+        :return: bool: True once a frame has been captured, False if the source failed or the timeout expired
+        """
+        self.ready.wait(timeout)
+        return self.first_frame_ns is not None
+
+    def recording_done(self) -> bool:
+        return not self.is_running() or (self.n_loop == 0 and not self.is_recording())
 
+    def wait_recording_done(self, timeout=None) -> bool:
+        """
+        Method that waits until the last clip is recorded or the camera has stopped.
+
+        :return: bool: False if the timeout expired first
+        """
+        return self.state.wait_until(self.recording_done, timeout)
+
+    def startup_ms(self):
+        if self.first_frame_ns is None: return None
+        return round((self.first_frame_ns - self.started_ns) / 1e6, 1)
 
     def restart_camera(self):
-        if self.camera_thread is None: return
-        if not self.camera_thread.is_alive: return
+        if not self.is_running(): return
         self.stop_recording()
         self.start_recording()
         
     def close_camera(self):
         if self.camera_thread is None: return
-        if not self.camera_thread.is_alive: return
-        self.camera_control = -1
-        self.stop_recording()
+        self.commands.append((CLOSE, time.monotonic_ns()))
+        # called by a handler running on the worker itself, it stops after this frame
+        if self.camera_thread is threading.current_thread(): return
         self.camera_thread.join()
+        self.camera_thread = None
+        if self.encoder_thread is not None:
+            self.encoder_thread.join()
+            self.encoder_thread = None
+        self.stop_encode_processes()
+        if self.reporter is not None:
+            self.reporter.stop()
+            self.reporter = None
 
         if self.vid is not None:
             self.vid.release()
             self.vid = None 
 
-    def count_down(self) -> None:
-        """
-        Method that prints a countdown before starting the camera.
-
-        :return: None
-        """
-        if self.debug: ic('countdown',self.countdown)
-        for i in range(self.countdown, 0, -1):
-            self.did_countdown(i)
-            time.sleep(1)
-        self.did_start()
-
     def get_next_filename(self) -> str:
         """
-        Method that generates the next available filename in the format output_000.mp4, output_001.mp4, etc.
+        Method that claims the next output file, output_000.mp4, output_001.mp4, etc. with the default template.
+        The folder is scanned once, then names come from the in-memory OutputIndex; it is rebuilt
+        when the folder, the template, the prefix or the codec change.
 
-        :return: str: the next available filename
+        :return: str: the path of the claimed, still empty, file
         """
-        while True:
-            filename = f"output_{self.index:03d}.{self.ext}"
-            file_path = os.path.join(self.path, filename)
-            if not os.path.exists(file_path):
-                self.index += 1
-                return file_path
-            self.index += 1
+        fields = {
+            "prefix": self.prefix,
+            "camera": re.sub(r"[^A-Za-z0-9]+", "-", str(self.camera)).strip("-"),
+            "ext": codec_extension(self.codec),
+        }
+        index = self.output_index
+        if index is None or index.path != self.path or index.template != self.name_template or index.fields != fields:
+            index = self.output_index = OutputIndex(self.path, self.name_template, **fields)
+        return index.claim()
 
     def map_dir(self) -> list:
         """
@@ -229,40 +523,37 @@ class CameraManager:
     def did_error(self, message: str):
         if self.debug:
              ic('ERROR:',message)
-        if self.on_error is None: return
-        
-        self.on_error(message)
+        self.events.publish(ERROR, message)
 
     def did_start(self):
         if self.debug:
             ic("Starting the camera up ...")
-        if self.on_start is None: return
-        
-        self.on_start()
+        self.events.publish(START)
     
     def did_stop(self):
-        self.vid.release()
-        if self.writer is not None: self.writer.release()
-        self.finished = True
+        if self.vid is not None:
+            self.vid.release()
+        self.end_clip()
+        self.frame_queue.close()
+        self.state.transition(STOPPING)
+        self.state.transition(IDLE)
+        self.ready.set()
 
         if self.debug:
             ic("Stopping the camera ...")
-        if self.on_stop is None: return
-        
-        self.on_stop()
+        self.events.publish(STOP)
 
     def did_countdown(self,i):
         if self.debug: ic('countdown',self.countdown,i)
-        if self.on_countdown is None: return
-        
-        self.on_countdown(i)
+        self.events.publish(COUNTDOWN_EVENT, i)
         
 
     def did_frame_ready(self, frame):
-        if self.debug:
-            ic("Starting the camera up ...")
-            #cv2.imshow('Camera', frame)
-        if self.on_frame_ready is None: return 
-        
-        self.on_frame_ready(frame)
-        
\ No newline at end of file
+        #cv2.imshow('Camera', frame)
+        self.events.publish(FRAME_READY, frame)
+
+    def did_frame_written(self, timestamp):
+        self.events.publish(FRAME_WRITTEN, timestamp)
+
+    def did_clip_closed(self, clip):
+        self.events.publish(CLIP_CLOSED, clip)
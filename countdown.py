@@ -0,0 +1,79 @@
+import queue
+import tkinter as tk
+
+DONE = 0
+
+
+class CountdownOverlay:
+    """
+    Countdown drawn over the preview canvas.
+
+    The countdown ticks come from the camera worker, which must never wait for Tk, so
+    post() only puts them on a thread-safe queue: any Tk call from another thread would
+    block it until the Tk thread serves the call. The Tk thread polls the queue with
+    root.after every poll_ms, draws the latest tick as a single canvas text item, and a
+    second timer hides it if no tick follows, e.g. when the recording is stopped during
+    the countdown.
+    """
+
+    def __init__(self, canvas, tick_ms=1000, poll_ms=50):
+        self.canvas = canvas
+        self.tick_ms = tick_ms
+        self.poll_ms = poll_ms
+        self.events = queue.Queue()
+        self.text = None
+        self.box = None
+        self.hide_timer = None
+        self.canvas.after(self.poll_ms, self.poll)
+
+    def post(self, count) -> None:
+        """
+        Method called from any thread with the seconds left, DONE once the recording starts.
+
+        :return: None
+        """
+        self.events.put(count)
+
+    def poll(self) -> None:
+        self.update()
+        try:
+            self.canvas.after(self.poll_ms, self.poll)
+        except tk.TclError:
+            pass  # the window is gone
+
+    def update(self) -> None:
+        count = None
+        while True:
+            try:
+                count = self.events.get_nowait()
+            except queue.Empty:
+                break
+        if count is None: return
+        if self.hide_timer is not None:
+            self.canvas.after_cancel(self.hide_timer)
+            self.hide_timer = None
+        if count == DONE:
+            self.hide()
+            return
+        self.show(f"Recording starts in {count}...")
+        # hide a stale number if the next tick never comes
+        self.hide_timer = self.canvas.after(self.tick_ms + self.tick_ms // 2, self.hide)
+
+    def show(self, message) -> None:
+        x, y = int(self.canvas["width"]) // 2, int(self.canvas["height"]) // 2
+        if self.text is None:
+            self.box = self.canvas.create_rectangle(0, 0, 0, 0, fill="white", outline="")
+            self.text = self.canvas.create_text(x, y, text=message, font=("Helvetica", 24))
+        else:
+            self.canvas.itemconfig(self.text, text=message, state=tk.NORMAL)
+            self.canvas.itemconfig(self.box, state=tk.NORMAL)
+        left, top, right, bottom = self.canvas.bbox(self.text)
+        self.canvas.coords(self.box, left - 10, top - 5, right + 10, bottom + 5)
+        self.canvas.tag_raise(self.box)
+        self.canvas.tag_raise(self.text)
+
+    def hide(self) -> None:
+        self.hide_timer = None
+        if self.text is None: return
+        self.canvas.itemconfig(self.text, state=tk.HIDDEN)
+        self.canvas.itemconfig(self.box, state=tk.HIDDEN)
@@ -0,0 +1,172 @@
+import json
+import os
+import shutil
+import subprocess
+import cv2
+import numpy as np
+
+# codec -> (backend, container extension)
+CODECS = {
+    "mp4v": ("opencv", "mp4"),
+    "MJPG": ("opencv", "avi"),
+    "XVID": ("opencv", "avi"),
+    "x264": ("ffmpeg", "mp4"),
+    "ffv1": ("ffmpeg", "mkv"),
+    "rawvideo": ("ffmpeg", "avi"),
+    "raw": ("raw", "raw"),
+}
+
+PRESETS = ("ultrafast", "superfast", "veryfast", "faster", "fast", "medium", "slow")
+
+FFMPEG_CODECS = {
+    "x264": ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"],
+    "ffv1": ["-c:v", "ffv1", "-level", "3"],
+    "rawvideo": ["-c:v", "rawvideo", "-pix_fmt", "bgr24"],
+}
+
+
+class Encoder:
+    """
+    Base class of the video writers used by the clips: write() BGR frames, release() to finish the file.
+    """
+
+    def __init__(self, filename, fps, size):
+        self.filename = filename
+        self.fps = fps
+        self.size = size
+
+    def write(self, frame) -> None:
+        raise NotImplementedError
+
+    def release(self) -> None:
+        raise NotImplementedError
+
+    def paths(self) -> list:
+        return [self.filename]
+
+    def discard(self) -> None:
+        """
+        Method that releases the encoder and deletes whatever it wrote.
+
+        :return: None
+        """
+        self.release()
+        for path in self.paths():
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class CvEncoder(Encoder):
+    """
+    cv2.VideoWriter with a fourcc such as mp4v, MJPG or XVID.
+    """
+
+    def __init__(self, filename, fps, size, codec="mp4v"):
+        super().__init__(filename, fps, size)
+        self.writer = cv2.VideoWriter(filename=filename, fourcc=cv2.VideoWriter_fourcc(*codec), fps=fps, frameSize=size)
+
+    def write(self, frame) -> None:
+        self.writer.write(frame)
+
+    def release(self) -> None:
+        self.writer.release()
+
+
+class FfmpegEncoder(Encoder):
+    """
+    ffmpeg subprocess fed raw BGR frames through a pipe; the frame buffer is handed to the
+    pipe as is, without a tobytes() copy.
+    """
+
+    def __init__(self, filename, fps, size, codec="x264", preset="veryfast"):
+        super().__init__(filename, fps, size)
+        check_codec(codec)
+        ffmpeg = shutil.which("ffmpeg")
+        width, height = size
+        command = [
+            ffmpeg, "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+        ] + FFMPEG_CODECS[codec]
+        if codec == "x264":
+            command += ["-preset", preset]
+        self.proc = subprocess.Popen(command + [filename], stdin=subprocess.PIPE)
+
+    def write(self, frame) -> None:
+        if self.proc.stdin.closed: return
+        self.proc.stdin.write(frame.data)
+
+    def release(self) -> None:
+        if self.proc.stdin.closed: return
+        self.proc.stdin.close()
+        self.proc.wait()
+
+
+class RawEncoder(Encoder):
+    """
+    Lossless dump of the frames, back to back, with a JSON header next to the file.
+    load_raw() maps the dump back as a (frames, height, width, 3) array without reading it.
+    """
+
+    def __init__(self, filename, fps, size):
+        super().__init__(filename, fps, size)
+        width, height = size
+        with open(self.header_path(filename), "w") as f:
+            json.dump({"width": width, "height": height, "channels": 3, "dtype": "uint8", "fps": fps}, f)
+        self.file = open(filename, "wb")
+
+    @staticmethod
+    def header_path(filename) -> str:
+        return filename + ".json"
+
+    def write(self, frame) -> None:
+        if self.file.closed: return
+        self.file.write(frame.data)
+
+    def release(self) -> None:
+        self.file.close()
+
+    def paths(self) -> list:
+        return [self.filename, self.header_path(self.filename)]
+
+
+def load_raw(filename):
+    """
+    Method that memory-maps a dump written by RawEncoder.
+
+    :return: np.memmap: the frames with shape (frames, height, width, channels)
+    """
+    with open(RawEncoder.header_path(filename)) as f:
+        header = json.load(f)
+    frame_shape = (header["height"], header["width"], header["channels"])
+    return np.memmap(filename, dtype=header["dtype"], mode="r").reshape((-1,) + frame_shape)
+
+
+def check_codec(codec) -> None:
+    """
+    Method that checks that the backend of a codec can run here.
+
+    :return: None, raises ValueError for unknown codecs and RuntimeError when ffmpeg is missing
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}, expected one of {tuple(CODECS)}")
+    if CODECS[codec][0] == "ffmpeg" and shutil.which("ffmpeg") is None:
+        raise RuntimeError(f"The {codec} codec needs ffmpeg on the PATH")
+
+
+def codec_extension(codec) -> str:
+    return CODECS[codec][1]
+
+
+def open_encoder(filename, fps, size, codec="mp4v", preset="veryfast") -> Encoder:
+    """
+    Method that opens the encoder backend of a codec.
+
+    :return: Encoder: the opened encoder
+    """
+    check_codec(codec)
+    backend = CODECS[codec][0]
+    if backend == "opencv":
+        return CvEncoder(filename, fps, size, codec)
+    if backend == "ffmpeg":
+        return FfmpegEncoder(filename, fps, size, codec, preset)
+    return RawEncoder(filename, fps, size)
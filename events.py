@@ -0,0 +1,165 @@
+import threading
+import time
+from collections import deque
+import numpy as np
+from icecream import ic
+from metrics import Histogram
+
+START = "start"
+STOP = "stop"
+ERROR = "error"
+COUNTDOWN = "countdown"
+FRAME_READY = "frame_ready"
+FRAME_WRITTEN = "frame_written"
+CLIP_CLOSED = "clip_closed"
+EVENTS = (START, STOP, ERROR, COUNTDOWN, FRAME_READY, FRAME_WRITTEN, CLIP_CLOSED)
+
+
+class Subscription:
+    """
+    One handler of one event, with its delivery counters.
+
+    A synchronous subscription runs the handler on the publishing thread and is meant for
+    handlers that return in microseconds (copying a frame into a mailbox, appending to a list).
+    Any other handler gets a bounded queue and a delivery thread of its own: publishing only
+    appends to the queue, the oldest event is dropped when the queue is full, and a slow
+    handler never holds up the capture loop or the other subscribers.
+    """
+
+    def __init__(self, event, handler, sync=False, queue_size=64):
+        self.event = event
+        self.handler = handler
+        self.sync = sync
+        self.queue_size = queue_size
+        self.pending = deque()
+        self.cond = threading.Condition()
+        self.closed = False
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.latency = Histogram()
+        self.thread = None
+        if not sync:
+            self.thread = threading.Thread(target=self.deliver, daemon=True)
+            self.thread.start()
+
+    def push(self, args) -> None:
+        if self.sync:
+            t0 = time.perf_counter_ns()
+            self.call(args)
+            with self.cond:
+                self.delivered += 1
+                self.latency.record(time.perf_counter_ns() - t0)
+            return
+        with self.cond:
+            if self.closed: return
+            if len(self.pending) >= self.queue_size:
+                self.pending.popleft()
+                self.dropped += 1
+            self.pending.append((time.perf_counter_ns(), args))
+            self.cond.notify()
+
+    def deliver(self) -> None:
+        """
+        Method run by the delivery thread until the subscription is closed and its queue is empty.
+
+        :return: None
+        """
+        while True:
+            with self.cond:
+                while not self.pending and not self.closed:
+                    self.cond.wait()
+                if not self.pending: break
+                published, args = self.pending.popleft()
+            self.latency.record(time.perf_counter_ns() - published)
+            self.call(args)
+            self.delivered += 1
+
+    def call(self, args) -> None:
+        try:
+            self.handler(*args)
+        except Exception as e:
+            self.errors += 1
+            ic('event handler failed:', self.event, e)
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def stats(self) -> dict:
+        """
+        Method that describes the delivery of the subscription.
+
+        :return: dict: delivered/dropped/failed events, queue depth and latency (handler time when sync, queueing delay otherwise)
+        """
+        return {
+            "handler": getattr(self.handler, "__qualname__", repr(self.handler)),
+            "sync": self.sync,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queued": len(self.pending),
+            "latency": self.latency.snapshot(),
+        }
+
+
+class EventBus:
+    """
+    Publish/subscribe hub of the CameraManager events, safe to use from any thread.
+
+    Several handlers can subscribe to the same event. numpy arrays published to
+    asynchronous subscribers are copied once per publish, as the capture thread reuses its
+    frame buffers; the copy is shared by those subscribers, which must not modify it.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def subscribe(self, event, handler, sync=False, queue_size=64) -> Subscription:
+        if event not in EVENTS:
+            raise ValueError(f"Unknown event {event!r}, expected one of {EVENTS}")
+        subscription = Subscription(event, handler, sync, queue_size)
+        with self.lock:
+            # copy on write, publish() iterates without taking the lock
+            self.subscriptions[event] = self.subscriptions.get(event, ()) + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription) -> None:
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.event, ())
+            self.subscriptions[subscription.event] = tuple(s for s in subscriptions if s is not subscription)
+        subscription.close()
+
+    def publish(self, event, *args) -> None:
+        subscriptions = self.subscriptions.get(event)
+        if not subscriptions: return
+        copied = None
+        for subscription in subscriptions:
+            if subscription.sync:
+                subscription.push(args)
+                continue
+            if copied is None:
+                copied = tuple(arg.copy() if isinstance(arg, np.ndarray) else arg for arg in args)
+            subscription.push(copied)
+
+    def has_subscribers(self, event) -> bool:
+        return bool(self.subscriptions.get(event))
+
+    def close(self) -> None:
+        """
+        Method that delivers what is still queued and stops the delivery threads.
+
+        :return: None
+        """
+        with self.lock:
+            subscriptions = [s for event in self.subscriptions.values() for s in event]
+            self.subscriptions = {}
+        for subscription in subscriptions:
+            subscription.close()
+
+    def stats(self) -> dict:
+        return {event: [s.stats() for s in subscriptions] for event, subscriptions in self.subscriptions.items() if subscriptions}
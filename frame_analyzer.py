@@ -1,82 +1,342 @@
 import sys
 import argparse
-import csv
 import os
-from jetson_inference import poseNet
-from jetson_utils import videoSource, videoOutput, Log
-
-def save_csv_with_increment(base_name):
-    max_index = -1
-    for filename in os.listdir('.'):
-        if filename.startswith(base_name) and filename.endswith('.csv'):
-            try:
-                index = int(filename[len(base_name)+1:-4])
-                if index > max_index:
-                    max_index = index
-            except ValueError:
-                pass
-    new_index = max_index + 1
-    new_filename = f"{base_name}_{new_index:03d}.csv"
-    return new_filename
-
-parser = argparse.ArgumentParser(description="Run pose estimation DNN on a video/image stream.", 
-                                 formatter_class=argparse.RawTextHelpFormatter, 
-                                 epilog=poseNet.Usage() + videoSource.Usage() + videoOutput.Usage() + Log.Usage())
-
-parser.add_argument("input", type=str, default="", nargs='?', help="URI of the input stream (e.g. video file, camera index, etc.)")
-parser.add_argument("output", type=str, default="", nargs='?', help="URI of the output stream (e.g. display, video file, etc.)")
-parser.add_argument("--network", type=str, default="resnet18-body", help="pre-trained model to load (see below for options)")
-parser.add_argument("--overlay", type=str, default="links,keypoints", help="pose overlay flags (e.g. --overlay=links,keypoints)\nvalid combinations are:  'links', 'keypoints', 'boxes', 'none'")
-parser.add_argument("--threshold", type=float, default=0.15, help="minimum detection threshold to use") 
-
-try:
-    args = parser.parse_known_args()[0]
-except:
-    print("")
-    parser.print_help()
-    sys.exit(0)
-
-net = poseNet(args.network, sys.argv, args.threshold)
-input = videoSource(args.input, argv=sys.argv)
-output = videoOutput(args.output, argv=sys.argv)
-
-csv_filename = save_csv_with_increment('pose_coordinates')
-csv_file = open(csv_filename, 'w', newline='')
-csv_writer = csv.writer(csv_file)
-
-keypoints = [net.GetKeypointName(i) for i in range(net.GetNumKeypoints())]
-header = ['Frame'] + keypoints
-csv_writer.writerow(header)
-
-frame_idx = 0
-
-while True:
-    img = input.Capture()
-    if img is None:
-        continue  
-
-    poses = net.Process(img, overlay=args.overlay)
-    row = [frame_idx]
-    coordinates = [ None ] * net.GetNumKeypoints()
-
-    for j,pose in enumerate(poses):
-        for i in range(len(pose.Keypoints)):
-            keypoint = pose.Keypoints[i]
-            if keypoint:
-                if coordinates[i] is None:
-                    coordinates[i] = []
-                coordinates[i].append([j, keypoint.x, keypoint.y])
-
-    row.extend(coordinates)
-    csv_writer.writerow(row)
-
-    output.Render(img)
-    output.SetStatus("{:s} | Network {:.0f} FPS".format(args.network, net.GetNetworkFPS()))
-    net.PrintProfilerTimes()
-
-    frame_idx += 1
-
-    if not input.IsStreaming() or not output.IsStreaming():
-        break
-
-csv_file.close()
+import time
+import cv2
+from icecream import ic
+from batch_decoder import BatchDecoder
+from encoders import open_encoder
+from frame_source import DeviceSource, make_source
+from metrics import Histogram
+from output_index import DEFAULT_TEMPLATE, OutputIndex
+from pose_estimators import BACKENDS, PoseNetEstimator, open_estimator
+from pose_output import FORMATS, check_format, export_csv, format_extension, open_pose_writer
+from pose_pool import PoseManifest, report, run_clips
+
+
+class JetsonStream:
+    """
+    jetson-utils videoSource/videoOutput, the CUDA images go straight to poseNet.
+    """
+
+    def __init__(self, input, output, argv=None):
+        from jetson_utils import videoSource, videoOutput  # only available on a Jetson
+        argv = sys.argv if argv is None else argv
+        self.input = videoSource(input, argv=argv)
+        self.output = videoOutput(output, argv=argv)
+
+    @staticmethod
+    def usage() -> str:
+        try:
+            from jetson_utils import videoSource, videoOutput, Log
+        except ImportError:
+            return ""
+        return videoSource.Usage() + videoOutput.Usage() + Log.Usage()
+
+    def capture(self, timeout_ms=1000):
+        return self.input.Capture(timeout=timeout_ms)
+
+    def render(self, image, status) -> None:
+        self.output.Render(image)
+        self.output.SetStatus(status)
+
+    def is_streaming(self) -> bool:
+        return self.input.IsStreaming() and self.output.IsStreaming()
+
+    def close(self) -> None:
+        pass
+
+
+class OpenCvStream:
+    """
+    FrameSource input (see frame_source.make_source) with BGR ndarray frames, shown in an
+    OpenCV window or written to a video file, for the backends running on the CPU.
+    Files are read as fast as the backend goes; a live device stays open after a failed read.
+    """
+
+    WINDOW = "frame_analyzer"
+
+    def __init__(self, input, output, headless=False):
+        self.source = make_source(input or 0, realtime=False)
+        self.live = isinstance(self.source, DeviceSource)
+        self.streaming = self.source.open()
+        if not self.streaming:
+            raise RuntimeError(f"Unable to open the input {input!r}")
+        self.show = not headless and output in ("", "display")
+        self.output = output
+        self.encoder = None
+
+    def capture(self, timeout_ms=1000):
+        ok, frame = self.source.read()
+        if not ok:
+            self.streaming = self.live
+            return None
+        return frame
+
+    def render(self, image, status) -> None:
+        if self.show:
+            cv2.imshow(self.WINDOW, image)
+            cv2.setWindowTitle(self.WINDOW, status)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                self.streaming = False
+        elif self.output not in ("", "display", "none"):
+            if self.encoder is None:
+                self.encoder = open_encoder(self.output, self.source.fps or 30.0, (image.shape[1], image.shape[0]))
+            self.encoder.write(image)
+
+    def is_streaming(self) -> bool:
+        return self.streaming
+
+    def close(self) -> None:
+        self.source.release()
+        if self.encoder is not None:
+            self.encoder.release()
+        if self.show:
+            cv2.destroyWindow(self.WINDOW)
+
+
+def open_stream(args):
+    """
+    Method that opens the input and output of a backend: jetson-utils for poseNet, OpenCV for the others.
+
+    :return: JetsonStream | OpenCvStream: the opened stream
+    """
+    if args.backend == "posenet":
+        return JetsonStream(args.input, args.output)
+    return OpenCvStream(args.input, args.output, args.headless)
+
+
+class CaptureBackoff:
+    """
+    What the analyzer does when a capture comes back empty.
+
+    The capture itself blocks for up to timeout_ms where the stream supports it; after that
+    the loop sleeps, starting at min_wait and doubling up to max_wait while the source stays
+    stalled, so a stalled source costs no CPU. Each stall, a run of empty captures, is counted
+    and its duration recorded once a frame comes back.
+    """
+
+    def __init__(self, timeout_ms=1000, min_wait=0.01, max_wait=1.0):
+        self.timeout_ms = timeout_ms
+        self.min_wait = min_wait
+        self.max_wait = max_wait
+        self.wait = min_wait
+        self.stall_start = None
+        self.stalls = 0
+        self.empty_captures = 0
+        self.durations = Histogram()
+
+    def stalled(self) -> None:
+        """
+        Method called after an empty capture, it sleeps for the current backoff.
+
+        :return: None
+        """
+        self.empty_captures += 1
+        if self.stall_start is None:
+            self.stall_start = time.monotonic_ns()
+            self.stalls += 1
+        time.sleep(self.wait)
+        self.wait = min(self.wait * 2, self.max_wait)
+
+    def resumed(self) -> None:
+        if self.stall_start is None: return
+        self.durations.record(time.monotonic_ns() - self.stall_start)
+        self.stall_start = None
+        self.wait = self.min_wait
+
+    def stats(self) -> dict:
+        stalled_ms = (time.monotonic_ns() - self.stall_start) / 1e6 if self.stall_start is not None else 0.0
+        return {
+            "stalls": self.stalls,
+            "empty_captures": self.empty_captures,
+            "stalled_ms": round(stalled_ms, 1),
+            "stall_duration": self.durations.snapshot(),
+        }
+
+
+def analyze(stream, estimator, pose_writer, overlay="links,keypoints", backoff=None, stats_interval=5.0) -> int:
+    """
+    Method that runs the estimator on every captured frame and writes the keypoints until the stream ends.
+    Every stats_interval seconds (never when 0) the loop prints its stats and the profiler times of the network.
+
+    :return: int: the number of frames processed
+    """
+    backoff = backoff or CaptureBackoff()
+    frame_idx = 0
+    t0 = time.monotonic()
+    next_report = t0 + stats_interval
+
+    def stats() -> dict:
+        elapsed = time.monotonic() - t0
+        return {
+            "frames": frame_idx,
+            "fps": round(frame_idx / elapsed, 1) if elapsed else 0.0,
+            "network_fps": round(estimator.network_fps(), 1),
+            "capture": backoff.stats(),
+        }
+
+    while True:
+        img = stream.capture(backoff.timeout_ms)
+        if img is None:
+            if not stream.is_streaming(): break
+            pose_writer.tick()
+            backoff.stalled()
+        else:
+            backoff.resumed()
+            keypoints = estimator.process(img, overlay)
+            pose_writer.extend(frame_idx, keypoints["person"], keypoints["keypoint"], keypoints["x"], keypoints["y"], keypoints["confidence"])
+            pose_writer.tick()
+
+            stream.render(img, "{:s} | Network {:.0f} FPS".format(estimator.name, estimator.network_fps()))
+            frame_idx += 1
+
+        if stats_interval > 0 and time.monotonic() >= next_report:
+            # on this thread, poseNet's profiler must not be read while it runs
+            estimator.print_profiler()
+            ic(stats())
+            next_report = time.monotonic() + stats_interval
+
+        if not stream.is_streaming():
+            break
+    ic(stats())
+    return frame_idx
+
+
+def find_clips(path, prefix="output", ext="mp4", template=DEFAULT_TEMPLATE) -> list:
+    """
+    Method that lists the clips a CameraManager recorded in a folder, named from its naming template.
+
+    :return: list: the clip paths in recording order
+    """
+    pattern = OutputIndex.compile(template, {"prefix": prefix, "ext": ext, "camera": ""})
+    clips = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            match = pattern.match(entry.name)
+            if match is not None and entry.is_file():
+                clips.append((int(match.group(1)), entry.path))
+    return [clip for _, clip in sorted(clips)]
+
+
+def pose_path(clip, format="npy") -> str:
+    return f"{os.path.splitext(clip)[0]}.pose.{format_extension(format)}"
+
+
+def analyze_clip(clip, estimator, pose_filename, format="npy", batch_size=8, prefetch=2) -> dict:
+    """
+    Method that extracts the poses of a recorded clip as fast as the backend goes: frames
+    are decoded on a background thread and go through the network batch_size at a time.
+
+    :return: dict: the frame count, frames/s and the time spent in each stage
+    """
+    decoder = BatchDecoder(clip, batch_size, prefetch)
+    if not decoder.start():
+        raise RuntimeError(f"Unable to open the clip {clip!r}")
+    pose_writer = open_pose_writer(pose_filename, estimator.keypoints, format)
+    infer_ns = write_ns = 0
+    t0 = time.perf_counter_ns()
+    try:
+        while True:
+            batch = decoder.get()
+            if batch is None: break
+            start, buf, n = batch
+            t1 = time.perf_counter_ns()
+            results = estimator.process_batch(buf[:n])
+            decoder.release(buf)
+            t2 = time.perf_counter_ns()
+            for i, keypoints in enumerate(results):
+                pose_writer.extend(start + i, keypoints["person"], keypoints["keypoint"], keypoints["x"], keypoints["y"], keypoints["confidence"])
+            pose_writer.tick()
+            infer_ns += t2 - t1
+            write_ns += time.perf_counter_ns() - t2
+    finally:
+        decoder.close()
+        t1 = time.perf_counter_ns()
+        pose_writer.close()
+        write_ns += time.perf_counter_ns() - t1
+    seconds = (time.perf_counter_ns() - t0) / 1e9
+    stats = decoder.stats()
+    stats.update({
+        "clip": os.path.basename(clip),
+        "fps": round(stats["frames"] / seconds, 1) if seconds else 0.0,
+        "seconds": round(seconds, 3),
+        "infer_s": round(infer_ns / 1e9, 3),
+        "write_s": round(write_ns / 1e9, 3),
+    })
+    return stats
+
+
+def analyze_offline(args) -> None:
+    """
+    Method that extracts the poses of a clip, or of every clip of a folder not done by a
+    previous run, with --workers processes, and prints the throughput.
+
+    :return: None
+    """
+    if os.path.isdir(args.input):
+        path, clips = args.input, find_clips(args.input, args.prefix, args.clip_ext)
+    else:
+        path, clips = os.path.dirname(args.input) or ".", [args.input]
+    manifest = PoseManifest(path)
+    t0 = time.perf_counter()
+    results = run_clips(clips, [pose_path(clip, args.format) for clip in clips], manifest, args.workers,
+                        args.backend, args.network, args.threshold, args.model, args.format, args.batch_size)
+    report(results, time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run pose estimation DNN on a video/image stream.",
+                                     formatter_class=argparse.RawTextHelpFormatter,
+                                     epilog=PoseNetEstimator.usage() + JetsonStream.usage())
+
+    parser.add_argument("input", type=str, default="", nargs='?', help="URI of the input stream (e.g. video file, camera index, etc.)")
+    parser.add_argument("output", type=str, default="", nargs='?', help="URI of the output stream (e.g. display, video file, etc.)")
+    parser.add_argument("--backend", type=str, default="posenet", choices=BACKENDS, help="pose estimator: posenet (Jetson), opencv (ONNX heatmap model on the CPU, see --model)\nor stub (deterministic fake keypoints, for tests and benchmarks)")
+    parser.add_argument("--network", type=str, default="resnet18-body", help="pre-trained model to load (see below for options)")
+    parser.add_argument("--model", type=str, default=None, help="ONNX model of the opencv backend")
+    parser.add_argument("--overlay", type=str, default="links,keypoints", help="pose overlay flags (e.g. --overlay=links,keypoints)\nvalid combinations are:  'links', 'keypoints', 'boxes', 'none'")
+    parser.add_argument("--threshold", type=float, default=0.15, help="minimum detection threshold to use")
+    parser.add_argument("--headless", action="store_true", help="do not open a preview window (opencv and stub backends)")
+    parser.add_argument("--format", type=str, default="npy", choices=tuple(FORMATS), help="pose output format: one memory-mappable .npy file per column, or parquet (needs pyarrow)")
+    parser.add_argument("--flush-interval", type=float, default=5.0, help="seconds between two writes of the buffered poses")
+    parser.add_argument("--csv", action="store_true", help="also convert the pose output to CSV at the end of the run")
+    parser.add_argument("--capture-timeout", type=int, default=1000, help="milliseconds a capture waits for a frame (jetson-utils streams)")
+    parser.add_argument("--stall-wait", type=float, default=1.0, help="longest sleep in seconds between two captures of a stalled source,\nthe sleep starts at 10 ms and doubles while the source stays stalled")
+    parser.add_argument("--stats-interval", type=float, default=5.0, help="seconds between two prints of the stats and profiler times, 0 to disable")
+    parser.add_argument("--offline", action="store_true", help="process recorded clips as fast as possible instead of a live stream:\ninput is a clip or a folder of CameraManager clips, each gets a <clip>.pose.* output")
+    parser.add_argument("--batch-size", type=int, default=8, help="frames per network pass in --offline mode")
+    parser.add_argument("--prefix", type=str, default="output", help="file prefix of the clips to process in an --offline folder")
+    parser.add_argument("--clip-ext", type=str, default="mp4", help="extension of the clips to process in an --offline folder")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes of --offline mode, each loads its own model;\nclips already listed in the folder's pose_manifest.jsonl are skipped")
+
+    try:
+        args = parser.parse_known_args()[0]
+    except:
+        print("")
+        parser.print_help()
+        sys.exit(0)
+
+    check_format(args.format)
+    if args.offline:
+        analyze_offline(args)
+        return
+    estimator = open_estimator(args.backend, args.network, args.threshold, args.model)
+    stream = open_stream(args)
+
+    pose_filename = OutputIndex('.', "pose_coordinates_{index:03d}.{ext}", ext=format_extension(args.format)).claim()
+    pose_writer = open_pose_writer(pose_filename, estimator.keypoints, args.format, flush_interval=args.flush_interval)
+
+    try:
+        backoff = CaptureBackoff(args.capture_timeout, min(0.01, args.stall_wait), args.stall_wait)
+        analyze(stream, estimator, pose_writer, args.overlay, backoff, args.stats_interval)
+    finally:
+        pose_writer.close()
+        stream.close()
+        estimator.close()
+    if args.csv:
+        export_csv(pose_filename, os.path.splitext(pose_filename)[0] + ".csv")
+
+
+if __name__ == '__main__':
+    main()
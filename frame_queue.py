@@ -0,0 +1,134 @@
+import threading
+from collections import deque
+import numpy as np
+
+BLOCK = "block"
+DROP_OLDEST = "drop-oldest"
+DROP_NEWEST = "drop-newest"
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST)
+
+
+class FrameQueue:
+    """
+    Bounded ring buffer of frames shared between the capture thread and the encoder thread.
+
+    Frames are copied into preallocated slots, so the producer can keep reusing its own
+    buffers. The consumer gets a slot back from get() and must hand it back with release()
+    once the frame has been written.
+    """
+
+    def __init__(self, size=32, policy=BLOCK):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy {policy!r}, expected one of {POLICIES}")
+        if size < 1:
+            raise ValueError("The frame queue needs at least one slot")
+        self.size = size
+        self.policy = policy
+
+        # one extra slot so the consumer can hold a frame while the queue is full
+        self.slots = [None] * (size + 1)
+        self.free = list(range(size + 1))
+        self.pending = deque()
+        self.depth = 0
+        self.held = 0
+        self.closed = False
+        self.cond = threading.Condition()
+
+        self.queued = 0
+        self.dropped = 0
+        self.high_water = 0
+
+    def put(self, frame, meta=None) -> bool:
+        """
+        Method that copies a frame into a free slot, applying the backpressure policy when full.
+
+        :return: bool: True if the frame was queued, False if it was dropped or the queue is closed
+        """
+        with self.cond:
+            while self.depth >= self.size and not self.closed:
+                if self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.policy == DROP_OLDEST:
+                    self.drop_oldest()
+                    break
+                self.cond.wait()
+            if self.closed:
+                return False
+            slot = self.free.pop()
+
+        buf = self.slots[slot]
+        if buf is None or buf.shape != frame.shape or buf.dtype != frame.dtype:
+            buf = self.slots[slot] = np.empty_like(frame)
+        np.copyto(buf, frame)
+
+        with self.cond:
+            self.pending.append((slot, meta))
+            self.depth += 1
+            self.queued += 1
+            if self.depth > self.high_water:
+                self.high_water = self.depth
+            self.cond.notify_all()
+        return True
+
+    def put_marker(self, meta) -> None:
+        """
+        Method that queues a control item without a frame. Markers are never dropped and
+        keep their position relative to the frames around them.
+
+        :return: None
+        """
+        with self.cond:
+            self.pending.append((-1, meta))
+            self.cond.notify_all()
+
+    def drop_oldest(self) -> None:
+        for i, (slot, _) in enumerate(self.pending):
+            if slot < 0: continue
+            del self.pending[i]
+            self.free.append(slot)
+            self.depth -= 1
+            self.dropped += 1
+            return
+
+    def get(self, timeout=None):
+        """
+        Method that waits for the next item in the queue.
+
+        :return: tuple: (slot, frame, meta), frame is None for markers; None once the queue is closed and drained
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.pending or self.closed, timeout):
+                return None
+            if not self.pending:
+                return None
+            slot, meta = self.pending.popleft()
+            if slot < 0:
+                return slot, None, meta
+            self.depth -= 1
+            self.held += 1
+            return slot, self.slots[slot], meta
+
+    def release(self, slot) -> None:
+        if slot < 0: return
+        with self.cond:
+            self.free.append(slot)
+            self.held -= 1
+            self.cond.notify_all()
+
+    def join(self, timeout=None) -> bool:
+        """
+        Method that waits until every queued item has been consumed and released.
+
+        :return: bool: False if the timeout expired first
+        """
+        with self.cond:
+            return self.cond.wait_for(lambda: not self.pending and self.held == 0, timeout)
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def __len__(self):
+        return self.depth
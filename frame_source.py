@@ -0,0 +1,290 @@
+import os
+import re
+import sys
+import time
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+
+
+class FrameSource:
+    """
+    Base class of everything CameraManager can capture from.
+
+    Subclasses implement open_source() and read_frame(); the base class paces the reads
+    at the source fps when realtime is set, so files and generators behave like a camera,
+    or hands frames out as fast as possible otherwise.
+    """
+
+    def __init__(self, fps=30.0, realtime=True):
+        self.fps = fps
+        self.realtime = realtime
+        self.size = (0, 0)
+        self.opened = False
+        self.next_time = 0.0
+
+    def open(self) -> bool:
+        """
+        Method that (re)opens the source and fills in its size and fps.
+
+        :return: bool: True if the source can be read
+        """
+        self.release()
+        self.opened = self.open_source()
+        self.next_time = time.monotonic()
+        return self.opened
+
+    def is_opened(self) -> bool:
+        return self.opened
+
+    def read(self, image=None):
+        """
+        Method that returns the next frame, writing it into image when the shape matches.
+
+        :return: tuple: (ok, frame) like cv2.VideoCapture.read
+        """
+        if not self.opened:
+            return False, None
+        if self.realtime and self.fps > 0:
+            self.next_time += 1.0 / self.fps
+            delay = self.next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # fell behind, do not try to catch up with a burst of frames
+                self.next_time = time.monotonic()
+        return self.read_frame(image)
+
+    def release(self) -> None:
+        self.opened = False
+
+    def open_source(self) -> bool:
+        raise NotImplementedError
+
+    def read_frame(self, image):
+        raise NotImplementedError
+
+
+class CaptureSource(FrameSource):
+    """
+    Frame source backed by a cv2.VideoCapture.
+    """
+
+    def __init__(self, fps=30.0, realtime=True):
+        super().__init__(fps, realtime)
+        self.vid = None
+
+    def create_capture(self):
+        raise NotImplementedError
+
+    def open_source(self) -> bool:
+        self.vid = self.create_capture()
+        if not self.vid.isOpened():
+            return False
+        self.size = (int(self.vid.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.vid.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        return True
+
+    def read_frame(self, image):
+        return self.vid.read(image)
+
+    def release(self) -> None:
+        super().release()
+        if self.vid is not None:
+            self.vid.release()
+            self.vid = None
+
+
+class DeviceSource(CaptureSource):
+    """
+    Live capture device, using the native OpenCV backend of the platform.
+    The device paces itself, so reads are never throttled.
+    """
+
+    def __init__(self, index=0, fps=16.0):
+        super().__init__(fps, realtime=False)
+        self.index = index
+
+    @staticmethod
+    def backend() -> int:
+        if sys.platform.startswith("win"): return cv2.CAP_DSHOW
+        if sys.platform == "darwin": return cv2.CAP_AVFOUNDATION
+        if sys.platform.startswith("linux"): return cv2.CAP_V4L2
+        return cv2.CAP_ANY
+
+    def create_capture(self):
+        vid = cv2.VideoCapture(self.index, self.backend())
+        vid.set(cv2.CAP_PROP_FPS, self.fps)
+        return vid
+
+    def __str__(self):
+        return str(self.index)
+
+
+class VideoFileSource(CaptureSource):
+    """
+    Replays a video file, or a network stream such as rtsp://, at its native fps or at max speed.
+    """
+
+    def __init__(self, path, realtime=True, loop=False):
+        super().__init__(0.0, realtime)
+        self.path = path
+        self.loop = loop
+
+    def create_capture(self):
+        return cv2.VideoCapture(self.path)
+
+    def open_source(self) -> bool:
+        if not super().open_source():
+            return False
+        self.fps = self.vid.get(cv2.CAP_PROP_FPS) or 30.0
+        return True
+
+    def read_frame(self, image):
+        ret, frame = self.vid.read(image)
+        if not ret and self.loop:
+            self.vid.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.vid.read(image)
+        return ret, frame
+
+    def __str__(self):
+        return self.path
+
+
+class ImageSequenceSource(FrameSource):
+    """
+    Plays the images of a directory in filename order.
+    """
+
+    def __init__(self, directory, fps=30.0, realtime=True, loop=False):
+        super().__init__(fps, realtime)
+        self.directory = directory
+        self.loop = loop
+        self.files = []
+        self.position = 0
+
+    def open_source(self) -> bool:
+        self.files = sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.position = 0
+        if not self.files:
+            return False
+        first = cv2.imread(self.files[0])
+        if first is None:
+            return False
+        self.size = (first.shape[1], first.shape[0])
+        return True
+
+    def read_frame(self, image):
+        if self.position >= len(self.files):
+            if not self.loop:
+                return False, None
+            self.position = 0
+        frame = cv2.imread(self.files[self.position])
+        self.position += 1
+        if frame is None:
+            return False, None
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            frame = image
+        return True, frame
+
+    def __str__(self):
+        return self.directory
+
+
+class SyntheticSource(FrameSource):
+    """
+    Generates moving test patterns, for load-testing the pipeline without a camera.
+
+    Patterns:
+        gradient  a colour gradient scrolling horizontally, cheap to generate and to encode
+        noise     a cycle of random frames, the worst case for the encoders
+    """
+
+    PATTERNS = ("gradient", "noise")
+
+    def __init__(self, width=1280, height=720, fps=30.0, pattern="gradient", n_frames=-1, realtime=True):
+        super().__init__(fps, realtime)
+        if pattern not in self.PATTERNS:
+            raise ValueError(f"Unknown pattern {pattern!r}, expected one of {self.PATTERNS}")
+        self.size = (width, height)
+        self.pattern = pattern
+        self.n_frames = n_frames
+        self.position = 0
+        self.frames = None
+
+    def open_source(self) -> bool:
+        width, height = self.size
+        if self.pattern == "gradient":
+            xs = np.arange(2 * width, dtype=np.uint16)
+            row = np.stack([xs % 256, (xs // 2) % 256, 255 - xs % 256], axis=-1).astype(np.uint8)
+            self.frames = np.ascontiguousarray(np.broadcast_to(row, (height, 2 * width, 3)))
+        else:
+            rng = np.random.default_rng(0)
+            self.frames = rng.integers(0, 256, (8, height, width, 3), dtype=np.uint8)
+        self.position = 0
+        return True
+
+    def read_frame(self, image):
+        if self.n_frames >= 0 and self.position >= self.n_frames:
+            return False, None
+        width, height = self.size
+        if self.pattern == "gradient":
+            offset = (self.position * 8) % width
+            frame = self.frames[:, offset:offset + width]
+        else:
+            frame = self.frames[self.position % len(self.frames)]
+        self.position += 1
+        if image is None or image.shape != frame.shape:
+            image = np.empty(frame.shape, np.uint8)
+        np.copyto(image, frame)
+        return True, image
+
+    def __str__(self):
+        width, height = self.size
+        return f"synthetic:{width}x{height}@{self.fps:g}:{self.pattern}"
+
+
+def make_source(spec, fps=16.0, realtime=True) -> FrameSource:
+    """
+    Method that builds a frame source from a --src value:
+
+        0, 1, ...                       a capture device index
+        synthetic[:WxH][@FPS][:pattern] a generated test pattern, e.g. synthetic:1920x1080@30:noise
+        rtsp://..., http://...          a network stream
+        a directory                     an image sequence
+        anything else                   a video file
+
+    :return: FrameSource: the source, not opened yet
+    """
+    if isinstance(spec, FrameSource):
+        return spec
+    if isinstance(spec, int) or str(spec).isdigit():
+        return DeviceSource(int(spec), fps)
+
+    spec = str(spec)
+    if spec == "synthetic" or spec.startswith("synthetic:"):
+        width, height, pattern = 1280, 720, "gradient"
+        for part in spec.split(":")[1:]:
+            if part in SyntheticSource.PATTERNS:
+                pattern = part
+                continue
+            match = re.fullmatch(r"(?:(\d+)x(\d+))?(?:@(\d+(?:\.\d*)?))?", part.lower())
+            if not part or match is None:
+                raise ValueError(f"Invalid synthetic source {spec!r}: expected synthetic[:WxH][@FPS][:pattern] "
+                                 f"with a pattern among {SyntheticSource.PATTERNS}, got {part!r}")
+            if match.group(1):
+                width, height = int(match.group(1)), int(match.group(2))
+            if match.group(3):
+                fps = float(match.group(3))
+        if width <= 0 or height <= 0 or fps <= 0:
+            raise ValueError(f"Invalid synthetic source {spec!r}: the size and the fps must be positive")
+        return SyntheticSource(width, height, fps, pattern, realtime=realtime)
+    if "://" in spec:
+        return VideoFileSource(spec, realtime=False)
+    if os.path.isdir(spec):
+        return ImageSequenceSource(spec, fps, realtime)
+    return VideoFileSource(spec, realtime)
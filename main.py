@@ -1,12 +1,21 @@
 
 import time
+import os
 import argparse
+import threading
 import cv2
+import numpy as np
 from icecream import ic
 from camera import CameraManager
+from multi_camera import MultiCameraManager
+from frame_source import make_source
+from output_index import DEFAULT_TEMPLATE
+from events import START, STOP, ERROR, COUNTDOWN, FRAME_READY
+from frame_queue import POLICIES, BLOCK
+from transform import INTERPOLATIONS, STRATEGIES, AUTO
+from encoders import CODECS, PRESETS
 import signal
 import sys
-from  main_gui import CameraGUI
  
 
 def main():
@@ -15,6 +24,9 @@ def main():
                     " If you want to exit the cam you have to press the ESCape button or 'q' to quit!!!"
     )
     parser.add_argument("-g", action="store_true", help="Run the program in GUI format", default=False)
+    parser.add_argument("--headless", dest="headless", action="store_true", default=False,
+        help="Record without any preview window, stop with Ctrl+C"
+    )
     parser.add_argument("-o", dest="output",   type=str, nargs='?', default="./", help="URI of the output video")
     parser.add_argument("-l", dest="looping_value", type=str, nargs='?', default=1, 
         help="Number of times to capture video (the default value is 1, if you insert -1 it loops indefinitely until 'q' is pressed)"
@@ -22,13 +34,79 @@ def main():
     parser.add_argument("-d", dest="duration_vid", type=float, nargs='?', default=10,
         help="Number of seconds of video to capture"
     )
+    parser.add_argument("-f", dest="clip_frames", type=int, default=0,
+        help="Number of frames per video, overrides -d so every clip has the same frame count"
+    )
     parser.add_argument("-cd",dest="countdown", type=int, nargs='?', default=0, help="Number of seconds to wait before starting the camera"
     )
-    parser.add_argument("--src", dest="camera", type=int, nargs='?', default=0, help="Number of the camera to capture"
+    parser.add_argument("--src", dest="camera", type=str, nargs='?', default="0",
+        help="Source to capture: a camera number, a video file or rtsp:// URL, an image directory"
+             " or synthetic[:WxH][@FPS][:gradient|noise]. Separate several sources with commas (0,1,2)"
+             " to record them together on a common clock"
+    )
+    parser.add_argument("--sync-tolerance", dest="sync_tolerance", type=float, default=0.0,
+        help="With several sources, milliseconds within which frames of different cameras are matched"
+             " in the alignment index (0 uses half a frame of the slowest camera)"
+    )
+    parser.add_argument("--max-speed", dest="max_speed", action="store_true", default=False,
+        help="Replay files, image directories and synthetic sources as fast as possible instead of at their fps"
+    )
+    parser.add_argument("--queue-size", dest="queue_size", type=int, default=32,
+        help="Number of frames buffered between capture and encoding"
+    )
+    parser.add_argument("--backpressure", dest="backpressure", choices=POLICIES, default=BLOCK,
+        help="What to do when the encoder falls behind: block the capture, drop the oldest or the newest frame"
+    )
+    parser.add_argument("--interpolation", dest="interpolation", choices=tuple(INTERPOLATIONS), default="linear",
+        help="Interpolation used to scale the frames"
+    )
+    parser.add_argument("--transform", dest="transform", choices=STRATEGIES, default=AUTO,
+        help="Strategy used to flip and scale the frames (see bench/transform_bench.py)"
+    )
+    parser.add_argument("--codec", dest="codec", choices=tuple(CODECS), default="mp4v",
+        help="Video codec: mp4v/MJPG/XVID use OpenCV, x264/ffv1/rawvideo pipe into ffmpeg, raw dumps the frames uncompressed"
+    )
+    parser.add_argument("--preset", dest="preset", choices=PRESETS, default="veryfast",
+        help="x264 speed preset, faster presets use less CPU and produce larger files"
+    )
+    parser.add_argument("--encode-process", dest="encode_process", action="store_true", default=False,
+        help="Compress in a separate process fed through shared memory, so encoding runs on another core"
+    )
+    parser.add_argument("--preroll", dest="preroll", type=float, default=0.0,
+        help="Seconds of frames captured before each recording starts that are added at the beginning of the video"
+    )
+    parser.add_argument("--preroll-max-mb", dest="preroll_max_mb", type=int, default=256,
+        help="Memory cap of the pre-roll buffer in MB"
+    )
+    parser.add_argument("--name-template", dest="name_template", type=str, default=DEFAULT_TEMPLATE,
+        help="Output file names, with the fields {index} (required), {prefix}, {camera}, {ext} and {time},"
+             " e.g. '{time:%%Y%%m%%d-%%H%%M%%S}_cam{camera}_{index:04d}.{ext}'"
+    )
+    parser.add_argument("--preview-fps", dest="preview_fps", type=float, default=15.0,
+        help="Maximum redraw rate of the GUI preview, independent of the recording fps"
+    )
+    parser.add_argument("--stats", dest="stats_interval", type=float, default=0.0,
+        help="Print the pipeline stats every N seconds (0 disables the reporter)"
     )
 
     args = parser.parse_args()
-    cr = CameraRecorder(args.g,args.output,int(args.looping_value),args.duration_vid,args.countdown,args.camera)
+    if not os.path.isdir(args.output):
+        parser.error(f"-o: the output folder {args.output!r} does not exist")
+    if not os.access(args.output, os.W_OK | os.X_OK):
+        parser.error(f"-o: the output folder {args.output!r} is not writable")
+    for spec in args.camera.split(","):
+        try:
+            make_source(spec)
+        except ValueError as e:
+            parser.error(f"--src: {e}")
+    cr = CameraRecorder(args.g,args.output,int(args.looping_value),args.duration_vid,args.countdown,args.camera,
+                        queue_size=args.queue_size, backpressure=args.backpressure,
+                        interpolation=args.interpolation, transform=args.transform, realtime=not args.max_speed,
+                        stats_interval=args.stats_interval, clip_frames=args.clip_frames,
+                        preroll=args.preroll, preroll_max_mb=args.preroll_max_mb,
+                        codec=args.codec, preset=args.preset, encode_process=args.encode_process,
+                        sync_tolerance=args.sync_tolerance / 1000, preview_fps=args.preview_fps,
+                        headless=args.headless, name_template=args.name_template)
     cr.start()
 
 
@@ -38,15 +116,38 @@ def main():
 
 
 class CameraRecorder():
-    def __init__(self,gui,output,looping_value,duration_vid,countdown,camera):
+    def __init__(self,gui,output,looping_value,duration_vid,countdown,camera,queue_size=32,backpressure=BLOCK,
+                 interpolation="linear",transform=AUTO,realtime=True,stats_interval=0.0,clip_frames=0,
+                 preroll=0.0,preroll_max_mb=256,codec="mp4v",preset="veryfast",
+                 encode_process=False,sync_tolerance=0.0,preview_fps=15.0,headless=False,
+                 name_template=DEFAULT_TEMPLATE):
         self.use_gui = gui
+        self.headless = headless
         self.output = output 
         self.looping_value = looping_value
         self.duration_vid = duration_vid
         self.countdown = countdown
         self.camera = camera
+        self.queue_size = queue_size
+        self.backpressure = backpressure
+        self.interpolation = interpolation
+        self.transform = transform
+        self.realtime = realtime
+        self.stats_interval = stats_interval
+        self.clip_frames = clip_frames
+        self.preroll = preroll
+        self.preroll_max_mb = preroll_max_mb
+        self.codec = codec
+        self.preset = preset
+        self.encode_process = encode_process
+        self.sync_tolerance = sync_tolerance
+        self.preview_fps = preview_fps
+        self.name_template = name_template
         self.camera_manager = None
-        self.last_frame = None
+        self.last_frames = {}
+        self.shown_frames = {}
+        self.frame_seq = 0
+        self.frame_ready = threading.Condition()
         self.gui = None
 
         signal.signal(signal.SIGINT, self.on_signal)
@@ -55,16 +156,32 @@ class CameraRecorder():
 
         t1 = time.time()
 
-        self.camera_manager = CameraManager(self.output, self.looping_value, self.duration_vid, self.countdown, self.camera)
+        kwargs = dict(queue_size=self.queue_size, backpressure=self.backpressure,
+                      interpolation=self.interpolation, transform=self.transform,
+                      realtime=self.realtime, stats_interval=self.stats_interval,
+                      clip_frames=self.clip_frames, preroll=self.preroll,
+                      preroll_max_mb=self.preroll_max_mb, codec=self.codec, preset=self.preset,
+                      encode_process=self.encode_process, name_template=self.name_template)
+        sources = self.camera.split(",")
+        if len(sources) > 1:
+            self.camera_manager = MultiCameraManager(self.output, self.looping_value, self.duration_vid, self.countdown,
+                                                     sources, sync_tolerance=self.sync_tolerance, **kwargs)
+        else:
+            self.camera_manager = CameraManager(self.output, self.looping_value, self.duration_vid, self.countdown,
+                                                self.camera, **kwargs)
 
-        if self.use_gui:
+        if self.use_gui and isinstance(self.camera_manager, MultiCameraManager):
+            ic("The GUI drives a single camera, recording the sources from the command line")
+            self.start_cli()
+        elif self.use_gui:
            self.start_gui()
         else:
             self.start_cli()
         
         t2 = time.time()
         ic(f"Executed in {t2 - t1} seconds")
-        cv2.destroyAllWindows()
+        if not self.headless:
+            cv2.destroyAllWindows()
 
 
 
@@ -72,39 +189,70 @@ class CameraRecorder():
     def start_gui(self):
         #gino = guil.VideoRecorder()
         #gino.run()
-        
-        self.gui = CameraGUI(self.camera_manager)
+        from main_gui import CameraGUI  # tkinter/PIL are only needed for the GUI, keep the CLI headless
+
+        self.gui = CameraGUI(self.camera_manager, preview_fps=self.preview_fps)
         self.gui.show()
         
 
     def start_cli(self):
 
-        self.camera_manager.on_start = self.on_camera_start
-        self.camera_manager.on_stop = self.on_camera_stop
-        self.camera_manager.on_error = self.on_camera_error
-        self.camera_manager.on_countdown = self.on_camera_countdown
-        self.camera_manager.on_frame_ready = self.on_camera_frame
+        events = self.camera_manager.events
+        events.subscribe(START, self.on_camera_start)
+        events.subscribe(STOP, self.on_camera_stop)
+        events.subscribe(ERROR, self.on_camera_error)
+        events.subscribe(COUNTDOWN, self.on_camera_countdown)
+        if not self.headless:
+            # only copies the frame into a reused buffer, it can run on the capture thread
+            events.subscribe(FRAME_READY, self.on_camera_frame, sync=True)
         self.camera_manager.start_camera()
-        while self.camera_manager.vid is None:
-            time.sleep(0.1)
-        self.camera_manager.start_recording()
-        while not self.camera_manager.is_recording():
-            time.sleep(0.1)
-
+        if not self.camera_manager.wait_ready():
+            self.camera_manager.close_camera()
+            events.close()
+            return
+        ic(f"First frame after {self.camera_manager.startup_ms()} ms")
+        if not self.camera_manager.start_recording():
+            self.camera_manager.close_camera()
+            events.close()
+            return
 
-        while self.camera_manager.n_loop != 0:
-            if self.last_frame is not None:
-                cv2.imshow('Camera', self.last_frame)
+        if self.headless:
+            self.camera_manager.wait_recording_done()
+        else:
+            self.show_frames()
+        self.camera_manager.close_camera()
+        ic(self.camera_manager.stats())
+        events.close()
+
+    def show_frames(self):
+        """
+        Method that shows the preview windows until the recording is done, 'q' quits and ESC restarts the clip.
+        A window is only redrawn when a new frame has arrived, in between the keyboard is polled every 100 ms.
+        The latest frames are copied out under the lock, so the capture thread can overwrite its buffers while they are shown.
+
+        :return: None
+        """
+        shown = 0
+        while not self.camera_manager.recording_done():
+            with self.frame_ready:
+                self.frame_ready.wait_for(lambda: self.frame_seq != shown, timeout=0.1)
+                seq = self.frame_seq
+                frames = []
+                if seq != shown:
+                    for index, frame in self.last_frames.items():
+                        frames.append((index, self.copy_frame(self.shown_frames, index, frame)))
+            if seq != shown:
+                shown = seq
+                for index, frame in frames:
+                    cv2.imshow('Camera' if index == 0 else f'Camera {index}', frame)
 
             key = cv2.waitKey(1) & 0xFF
             if key == ord('q'):
                 ic('key Q')
-                self.camera_manager.close_camera()
                 break
             elif key == 27:
                 ic('key ESC')
                 self.camera_manager.restart_camera()
-        self.camera_manager.close_camera()
 
 
     def on_camera_start(self):
@@ -123,11 +271,28 @@ class CameraRecorder():
         ic(message)
         
 
-    def on_camera_frame(self,frame):
+    def on_camera_frame(self,frame,index=0):
         #ic("Starting the camera up ...")
-        self.last_frame = frame
+        # called on the capture thread, the frame buffer is reused for the next frame
+        with self.frame_ready:
+            self.copy_frame(self.last_frames, index, frame)
+            self.frame_seq += 1
+            self.frame_ready.notify()
         #cv2.imshow('Camera', frame)
     
+    @staticmethod
+    def copy_frame(buffers, index, frame):
+        """
+        Method that copies a frame into the buffer kept for its camera, allocated only when the frame shape changes.
+
+        :return: ndarray: the buffer holding the copy
+        """
+        buf = buffers.get(index)
+        if buf is None or buf.shape != frame.shape or buf.dtype != frame.dtype:
+            buf = buffers[index] = np.empty_like(frame)
+        np.copyto(buf, frame)
+        return buf
+
     def on_signal(self, sig, frame):
         ic('You pressed Ctrl+C!')
         if self.camera_manager is not None:
@@ -1,26 +1,29 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
-import cv2
 import os
-import time
 import threading
-from PIL import Image, ImageTk
 from camera import CameraManager
+from preview import PreviewRenderer
+from countdown import CountdownOverlay, DONE
+from events import START, STOP, ERROR, COUNTDOWN, FRAME_READY
 from icecream import ic
 
 class CameraGUI:
-    def __init__(self, camera_manager: CameraManager, debug=False):
+    def __init__(self, camera_manager: CameraManager, debug=False, preview_fps=15.0):
         self.debug = debug
+        self.preview_fps = preview_fps
         self.root = tk.Tk()
         self.root.title("Camera Recorder")
 
         self.camera_manager = camera_manager
 
-        self.camera_manager.on_start = self.on_camera_start
-        self.camera_manager.on_stop = self.on_camera_stop
-        self.camera_manager.on_error = self.on_camera_error
-        self.camera_manager.on_countdown = self.on_camera_countdown
-        self.camera_manager.on_frame_ready = self.on_camera_frame
+        events = self.camera_manager.events
+        events.subscribe(START, self.on_camera_start)
+        events.subscribe(STOP, self.on_camera_stop)
+        events.subscribe(ERROR, self.on_camera_error)
+        # both only hand over to a queue or a mailbox without calling Tk, they can run on the camera threads
+        events.subscribe(COUNTDOWN, self.on_camera_countdown, sync=True)
+        events.subscribe(FRAME_READY, self.on_camera_frame, sync=True)
 
         #self.output_folder = path
         #self.recording_duration = vid_dur  # Default recording duration in seconds
@@ -29,11 +32,10 @@ class CameraGUI:
         #self.camera_index = cam  # Default camera index
         
         
-        self.camera_preview = None
+        self.preview = None
         self.cap = None
         self.recording = False
         self.file_index = 0  # Initialize file index for naming files
-        self.last_frame = None
 
         # GUI elements
         self.setup_ui()
@@ -93,6 +95,8 @@ class CameraGUI:
         # Camera preview canvas
         self.camera_canvas = tk.Canvas(self.root, width=640, height=480)
         self.camera_canvas.grid(row=5, column=0, columnspan=3, padx=10, pady=10)
+        self.preview = PreviewRenderer(self.camera_canvas, self.preview_fps)
+        self.countdown = CountdownOverlay(self.camera_canvas)
 
         # Start/Stop buttons
         self.start_button = tk.Button(self.root, text="Start Recording", command=self.start_recording)
@@ -101,17 +105,25 @@ class CameraGUI:
         self.stop_button = tk.Button(self.root, text="Stop Recording", command=self.stop_recording, state=tk.DISABLED)
         self.stop_button.grid(row=6, column=1, padx=10, pady=10)
 
+        # Status bar
+        self.status = tk.StringVar(self.root, value="Preview: waiting for frames")
+        status_bar = tk.Label(self.root, textvariable=self.status, anchor=tk.W, relief=tk.SUNKEN)
+        status_bar.grid(row=7, column=0, columnspan=3, sticky=tk.EW)
+        self.preview.on_rendered = self.on_preview_rendered
+
         
 
     def show(self):
         self.start_camera_preview()
         self.root.mainloop()
+        self.preview.close()
         # Initialize camera preview
         
 
 
     def on_camera_start(self):
         ic("Starting the camera up ...")
+        self.countdown.post(DONE)
 
     def on_camera_stop(self):
         #cv2.destroyAllWindows()
@@ -120,7 +132,7 @@ class CameraGUI:
     def on_camera_countdown(self,i):
         #cv2.destroyAllWindows()
         ic('countdown',self.camera_manager.countdown,i)
-        self.show_countdown(i)
+        self.countdown.post(i)
 
     def on_camera_error(self,message: str):
         ic(message)
@@ -128,22 +140,17 @@ class CameraGUI:
 
     def on_camera_frame(self,frame):
         #ic("Starting the camera up ...")
-        self.last_frame = frame
+        self.preview.submit(frame)
         #cv2.imshow('Camera', frame)
 
+    def on_preview_rendered(self, stats):
+        self.status.set(f"Preview: {stats['preview_drawn']} frames drawn, {stats['preview_skipped']} skipped,"
+                        f" UI thread {stats['preview_ui_ms']:.2f} ms/frame")
+
     def start_camera_preview(self):
-        self.camera_manager.camera = int(self.camera_selection.get())
+        self.camera_manager.camera = self.camera_selection.get()
         self.camera_manager.start_camera()
 
-        self.show_frame()
-
-    def show_frame(self):
-        if self.last_frame is not None:
-            frame = cv2.cvtColor(self.last_frame, cv2.COLOR_BGR2RGB)
-            self.camera_preview = ImageTk.PhotoImage(image=Image.fromarray(frame))
-            self.camera_canvas.create_image(0, 0, anchor=tk.NW, image=self.camera_preview)
-        self.camera_canvas.after(10, self.show_frame)
-
     def update_camera_index(self, value):
         self.camera_manager.camera = int(value)
         self.camera_manager.start_camera()
@@ -200,14 +207,7 @@ class CameraGUI:
     #def record_video_with_countdown(self):
     #    while self.recording:
     #        self.camera_manager.open_camera()
-            
-    def show_countdown(self, count):
-        countdown_label = tk.Label(self.root, text=f"Recording starts in {count} seconds...",
-                                   font=("Helvetica", 24), bg="white")
-        countdown_label.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
-        self.root.update()
-        time.sleep(1)
-        countdown_label.destroy()
+
 
     
 
@@ -0,0 +1,121 @@
+import threading
+from icecream import ic
+
+STAGES = ("read", "transform", "dispatch", "write")
+
+
+class Histogram:
+    """
+    Latency histogram with preallocated power-of-two nanosecond buckets.
+
+    Recording is a bit_length and a list increment, so it can sit on the per-frame path.
+    Percentiles are reported as the upper bound of their bucket, i.e. within a factor of two.
+    """
+
+    BUCKETS = 48  # 2**47 ns is about 39 hours
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, ns) -> None:
+        self.counts[min(ns.bit_length(), self.BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max: self.max = ns
+
+    def percentile(self, p) -> int:
+        """
+        Method that estimates a percentile of the recorded values.
+
+        :return: int: the upper bound in nanoseconds of the bucket holding the percentile
+        """
+        if self.count == 0: return 0
+        rank = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(1 << i, self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_us": round(self.total / self.count / 1000, 1) if self.count else 0.0,
+            "p50_us": round(self.percentile(50) / 1000, 1),
+            "p95_us": round(self.percentile(95) / 1000, 1),
+            "p99_us": round(self.percentile(99) / 1000, 1),
+            "max_us": round(self.max / 1000, 1),
+        }
+
+
+class Metrics:
+    """
+    Per-stage timings and counters of a CameraManager.
+    Each counter is only incremented by one thread, so no locking is needed.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.frames_read = 0
+        self.frames_written = 0
+        self.files_rotated = 0
+        self.bytes_written = 0
+
+    def record_capture(self, t0, t1, t2, t3) -> None:
+        """
+        Method that records the stages of one captured frame from the perf_counter_ns taken
+        before the read, after the read, after the transform and after the callbacks.
+
+        :return: None
+        """
+        self.frames_read += 1
+        if not self.enabled: return
+        self.stages["read"].record(t1 - t0)
+        self.stages["transform"].record(t2 - t1)
+        self.stages["dispatch"].record(t3 - t2)
+
+    def record_write(self, t0, t1) -> None:
+        self.frames_written += 1
+        if not self.enabled: return
+        self.stages["write"].record(t1 - t0)
+
+    def snapshot(self) -> dict:
+        return {
+            "frames_read": self.frames_read,
+            "frames_written": self.frames_written,
+            "files_rotated": self.files_rotated,
+            "bytes_written": self.bytes_written,
+            "stages": {stage: hist.snapshot() for stage, hist in self.stages.items()},
+        }
+
+
+class StatsReporter:
+    """
+    Thread that prints a stats snapshot every interval seconds until stopped.
+    """
+
+    def __init__(self, stats, interval=5.0):
+        self.stats = stats
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self) -> None:
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            ic(self.stats())
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
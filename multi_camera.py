@@ -0,0 +1,202 @@
+import time
+import threading
+from icecream import ic
+from camera import CameraManager
+from segments import ClipSchedule
+from sync import FrameSynchronizer
+from encoders import check_codec
+from events import EventBus, START, STOP, ERROR, COUNTDOWN, FRAME_READY, CLIP_CLOSED
+
+# time given to every camera to open its next file before a scheduled clip starts
+SCHEDULE_LEAD_NS = 500_000_000
+
+
+class MultiCameraManager:
+    """
+    Records several sources at once, each with its own CameraManager and so its own
+    capture and encoder threads.
+
+    All the cameras stamp their frames with the same monotonic clock and follow one
+    ClipSchedule: clip k starts at the same instant on every camera, and in looping mode
+    (n_loop=-1) the segments are cut on the same grid. With a frame count (clip_frames) the
+    clips are still cut on the schedule, clip_frames / fps long, not after clip_frames frames,
+    so a camera delivering fewer frames than its nominal fps stays aligned. Each camera writes its own files,
+    cam0_000.mp4, cam1_000.mp4, ..., and its own manifest, cam0_manifest.jsonl, ...
+    Every clip set gets an alignment index matching the frames of the cameras, see sync.py.
+    """
+
+    def __init__(self, path="./", n_loop=1, vid_dur=10, countdown=0, cams=(0,), debug=False,
+                 sync_tolerance=0.0, **kwargs):
+        self.debug = debug
+        self.path = path
+        self.duration = vid_dur
+        self.countdown = countdown
+        # the FRAME_READY handlers get (frame, camera index)
+        self.events = EventBus()
+        self.cameras = []
+        for i, cam in enumerate(cams):
+            camera = CameraManager(path, n_loop, vid_dur, 0, cam, debug, **kwargs)
+            camera.prefix = f"cam{i}"
+            camera.manifest = f"cam{i}_manifest.jsonl"
+            # forwarding is cheap, the subscribers of self.events choose how they are called
+            camera.events.subscribe(ERROR, lambda message, i=i: self.did_error(f"cam{i}: {message}"), sync=True)
+            camera.events.subscribe(STOP, self.camera_stopped, sync=True)
+            camera.events.subscribe(FRAME_READY, lambda frame, i=i: self.did_frame_ready(frame, i), sync=True)
+            camera.events.subscribe(CLIP_CLOSED, lambda clip, i=i: self.synchronizer.clip_closed(i, clip), sync=True)
+            self.cameras.append(camera)
+
+        # 0 matches frames within half a frame of the slowest camera
+        self.sync_tolerance_ns = int(sync_tolerance * 1e9) or None
+        self.synchronizer = FrameSynchronizer(path, len(self.cameras), self.sync_tolerance_ns)
+        self.schedule = None
+        self.started_at = None
+        self.stopped = False
+        self.lock = threading.Lock()
+
+    @property
+    def n_loop(self) -> int:
+        remaining = [camera.n_loop for camera in self.cameras if camera.n_loop != 0]
+        return remaining[0] if remaining else 0
+
+    @property
+    def vid(self):
+        """
+        The source of the first camera, None until every camera has opened its source.
+        """
+        if any(camera.vid is None for camera in self.cameras): return None
+        return self.cameras[0].vid
+
+    def start_camera(self) -> None:
+        self.stopped = False
+        for camera in self.cameras:
+            camera.start_camera()
+        self.started_at = time.monotonic_ns()
+
+    def start_recording(self) -> bool:
+        """
+        Method that starts the countdown and then the recording of every camera.
+
+        :return: bool: False if the codec cannot be used, the error is reported through did_error
+        """
+        try:
+            check_codec(self.cameras[0].codec)
+        except (RuntimeError, ValueError) as e:
+            self.did_error(f"Error: Could not open the video writer: {e}")
+            return False
+        t = threading.Thread(target=self.start_recording_thread)
+        t.start()
+        return True
+
+    def start_recording_thread(self) -> None:
+        """
+        Method that counts down once, then starts every camera on a common schedule whose
+        first clip begins SCHEDULE_LEAD_NS later, so no camera misses the first frames.
+
+        :return: None
+        """
+        start = time.monotonic()
+        for i in range(self.countdown, 0, -1):
+            self.did_countdown(i)
+            time.sleep(max(0.0, start + self.countdown - i + 1 - time.monotonic()))
+        self.did_start()
+
+        camera = self.cameras[0]
+        if camera.clip_frames > 0:
+            clip_ns = int(camera.clip_frames / camera.fps * 1e9)
+        else:
+            clip_ns = int(self.duration * 1e9)
+        self.synchronizer.flush()
+        self.synchronizer = FrameSynchronizer(self.path, len(self.cameras), self.sync_tolerance_ns)
+        # the lead only delays clip 0, the clips that follow start back to back
+        self.schedule = ClipSchedule(time.monotonic_ns() + SCHEDULE_LEAD_NS, clip_ns)
+        for camera in self.cameras:
+            camera.schedule = self.schedule
+            camera.clip_index = 0
+            camera.start_recording()
+
+    def stop_recording(self) -> None:
+        for camera in self.cameras:
+            camera.stop_recording()
+
+    def restart_camera(self) -> None:
+        self.stop_recording()
+        self.start_recording()
+
+    def close_camera(self) -> None:
+        # stop every clip at the same frame boundary before joining the threads one by one
+        for camera in self.cameras:
+            camera.stop_recording()
+        for camera in self.cameras:
+            camera.close_camera()
+        # the encoder threads have closed every clip, the sets a camera has no clip for can be written
+        self.synchronizer.flush()
+
+    def wait_ready(self, timeout=None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for camera in self.cameras:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not camera.wait_ready(left): return False
+        return True
+
+    def recording_done(self) -> bool:
+        return all(camera.recording_done() for camera in self.cameras)
+
+    def wait_recording_done(self, timeout=None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for camera in self.cameras:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not camera.wait_recording_done(left): return False
+        return True
+
+    def startup_ms(self):
+        latencies = [camera.startup_ms() for camera in self.cameras]
+        return None if None in latencies else max(latencies)
+
+    def is_running(self) -> bool:
+        return any(camera.is_running() for camera in self.cameras)
+
+    def is_recording(self) -> bool:
+        return all(camera.is_recording() for camera in self.cameras)
+
+    def stats(self) -> dict:
+        """
+        Method that returns the stats of every camera with its capture and encode frame rates.
+
+        :return: dict: camera name -> CameraManager.stats() plus capture_fps and encode_fps
+        """
+        elapsed = (time.monotonic_ns() - self.started_at) / 1e9 if self.started_at else 0.0
+        stats = {}
+        for camera in self.cameras:
+            camera_stats = camera.stats()
+            camera_stats["capture_fps"] = round(camera_stats["frames_read"] / elapsed, 2) if elapsed else 0.0
+            camera_stats["encode_fps"] = round(camera_stats["frames_written"] / elapsed, 2) if elapsed else 0.0
+            stats[camera.prefix] = camera_stats
+        return stats
+
+    def camera_stopped(self) -> None:
+        with self.lock:
+            if self.stopped or any(camera.is_running() for camera in self.cameras): return
+            self.stopped = True
+        self.did_stop()
+
+    def did_error(self, message: str):
+        if self.debug:
+            ic('ERROR:', message)
+        self.events.publish(ERROR, message)
+
+    def did_start(self):
+        if self.debug:
+            ic("Starting the cameras up ...")
+        self.events.publish(START)
+
+    def did_stop(self):
+        if self.debug:
+            ic("Stopping the cameras ...")
+        self.events.publish(STOP)
+
+    def did_countdown(self, i):
+        if self.debug: ic('countdown', self.countdown, i)
+        self.events.publish(COUNTDOWN, i)
+
+    def did_frame_ready(self, frame, index):
+        self.events.publish(FRAME_READY, frame, index)
@@ -0,0 +1,90 @@
+import datetime
+import os
+import re
+import string
+import threading
+
+DEFAULT_TEMPLATE = "{prefix}_{index:03d}.{ext}"
+
+
+class OutputIndex:
+    """
+    Allocates the output file names of a folder from a naming template.
+
+    The folder is scanned once with os.scandir for the highest index already used, after
+    that names are handed out from memory. Each name is claimed by creating the file with
+    O_CREAT | O_EXCL, so recorders sharing the folder (other cameras, other processes) never
+    get the same name: whoever loses the race moves on to the next index.
+
+    The template is a str.format string with the fields {index} (required), {time}, a
+    datetime taken when the name is claimed, e.g. {time:%Y%m%d-%H%M%S}, and any constant
+    given as keyword argument, such as {prefix}, {camera} or {ext}.
+    """
+
+    def __init__(self, path, template=DEFAULT_TEMPLATE, **fields):
+        self.path = path
+        self.template = template
+        self.fields = fields
+        self.pattern = self.compile(template, fields)
+        self.lock = threading.Lock()
+        self.next_index = self.scan()
+
+    @staticmethod
+    def compile(template, fields):
+        """
+        Method that turns the template into a regex matching the names it produces.
+
+        :return: re.Pattern: the regex, its first group is the index
+        """
+        regex = ""
+        has_index = False
+        for literal, name, spec, conversion in string.Formatter().parse(template):
+            regex += re.escape(literal)
+            if name is None: continue
+            if name == "index":
+                if has_index:
+                    raise ValueError(f"The naming template {template!r} uses {{index}} twice")
+                regex += r"(\d+)"
+                has_index = True
+            elif name == "time":
+                regex += r".+?"
+            elif name in fields:
+                regex += re.escape(format(fields[name], spec))
+            else:
+                raise ValueError(f"Unknown field {{{name}}} in the naming template {template!r}")
+        if not has_index:
+            raise ValueError(f"The naming template {template!r} needs an {{index}} field")
+        return re.compile(regex + "$")
+
+    def scan(self) -> int:
+        """
+        Method that reads the folder once.
+
+        :return: int: the index following the highest one in use
+        """
+        highest = -1
+        if not os.path.isdir(self.path): return 0
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                match = self.pattern.match(entry.name)
+                if match is not None:
+                    highest = max(highest, int(match.group(1)))
+        return highest + 1
+
+    def claim(self) -> str:
+        """
+        Method that reserves the next name by creating an empty file under it.
+
+        :return: str: the path of the claimed file
+        """
+        with self.lock:
+            while True:
+                index = self.next_index
+                self.next_index += 1
+                name = self.template.format(index=index, time=datetime.datetime.now(), **self.fields)
+                path = os.path.join(self.path, name)
+                try:
+                    os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                except FileExistsError:
+                    continue
+                return path
@@ -0,0 +1,266 @@
+import sys
+import time
+import cv2
+import numpy as np
+
+# one detected keypoint of one person, as returned by PoseEstimator.process()
+KEYPOINT_DTYPE = np.dtype([
+    ("person", "<i2"),
+    ("keypoint", "<i2"),
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("confidence", "<f4"),
+])
+
+COCO_KEYPOINTS = (
+    "nose", "left_eye", "right_eye", "left_ear", "right_ear",
+    "left_shoulder", "right_shoulder", "left_elbow", "right_elbow", "left_wrist", "right_wrist",
+    "left_hip", "right_hip", "left_knee", "right_knee", "left_ankle", "right_ankle",
+)
+COCO_LINKS = (
+    (0, 1), (0, 2), (1, 3), (2, 4), (5, 6), (5, 7), (7, 9), (6, 8), (8, 10),
+    (5, 11), (6, 12), (11, 12), (11, 13), (13, 15), (12, 14), (14, 16),
+)
+
+BACKENDS = ("posenet", "opencv", "stub")
+
+
+class PoseEstimator:
+    """
+    Base class of the pose estimation backends of frame_analyzer.
+
+    process() takes a frame in the image type of the backend (a CUDA image for poseNet, a
+    BGR ndarray for the others) and returns its keypoints as a KEYPOINT_DTYPE array, so the
+    capture loop and the pose writers never depend on the backend.
+    """
+
+    name = ""
+
+    def __init__(self, threshold=0.15):
+        self.threshold = threshold
+        self.keypoints = []
+        self.frames = 0
+        self.busy_ns = 0
+
+    def process(self, image, overlay="links,keypoints"):
+        """
+        Method that runs the network on one frame and draws the overlay on it.
+
+        :return: ndarray: one KEYPOINT_DTYPE row per detected keypoint
+        """
+        t0 = time.perf_counter_ns()
+        keypoints = self.infer(image, overlay)
+        self.busy_ns += time.perf_counter_ns() - t0
+        self.frames += 1
+        return keypoints
+
+    def process_batch(self, images, overlay="none") -> list:
+        """
+        Method that runs the network on a batch of BGR frames, in one pass when the backend can.
+
+        :return: list: the KEYPOINT_DTYPE array of each frame, in order
+        """
+        t0 = time.perf_counter_ns()
+        keypoints = self.infer_batch(images, overlay)
+        self.busy_ns += time.perf_counter_ns() - t0
+        self.frames += len(images)
+        return keypoints
+
+    def infer(self, image, overlay):
+        raise NotImplementedError
+
+    def infer_batch(self, images, overlay) -> list:
+        return [self.infer(image, overlay) for image in images]
+
+    def network_fps(self) -> float:
+        return self.frames / (self.busy_ns / 1e9) if self.busy_ns else 0.0
+
+    def print_profiler(self) -> None:
+        print(f"{self.name}: {self.frames} frames, {self.network_fps():.1f} FPS")
+
+    def close(self) -> None:
+        pass
+
+
+class PoseNetEstimator(PoseEstimator):
+    """
+    jetson-inference poseNet, running on the Jetson GPU with TensorRT.
+    """
+
+    name = "posenet"
+
+    def __init__(self, network="resnet18-body", threshold=0.15, argv=None):
+        from jetson_inference import poseNet  # only available on a Jetson
+        super().__init__(threshold)
+        self.net = poseNet(network, sys.argv if argv is None else argv, threshold)
+        self.keypoints = [self.net.GetKeypointName(i) for i in range(self.net.GetNumKeypoints())]
+
+    @staticmethod
+    def usage() -> str:
+        try:
+            from jetson_inference import poseNet
+        except ImportError:
+            return ""
+        return poseNet.Usage()
+
+    def infer(self, image, overlay):
+        if isinstance(image, np.ndarray):
+            from jetson_utils import cudaFromNumpy
+            image = cudaFromNumpy(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        poses = self.net.Process(image, overlay=overlay)
+        keypoints = np.empty(sum(len(pose.Keypoints) for pose in poses), KEYPOINT_DTYPE)
+        i = 0
+        for j, pose in enumerate(poses):
+            for keypoint in pose.Keypoints:
+                # poseNet keeps no per-keypoint confidence
+                keypoints[i] = (j, keypoint.ID, keypoint.x, keypoint.y, np.nan)
+                i += 1
+        return keypoints
+
+    def network_fps(self) -> float:
+        return self.net.GetNetworkFPS()
+
+    def print_profiler(self) -> None:
+        self.net.PrintProfilerTimes()
+
+
+class OpenCvEstimator(PoseEstimator):
+    """
+    Single person pose network in ONNX format, run on the CPU by the OpenCV DNN module.
+
+    The network must output one heatmap per keypoint, shaped (1, keypoints, height, width);
+    each keypoint is placed at the maximum of its heatmap and kept when that maximum is
+    above the threshold. Batches go through the network in one forward pass when the model
+    has a dynamic batch dimension, frame by frame otherwise.
+    """
+
+    name = "opencv"
+
+    def __init__(self, model, threshold=0.15, input_size=(256, 256), mean=(0, 0, 0), scale=1 / 255):
+        super().__init__(threshold)
+        self.net = cv2.dnn.readNetFromONNX(model)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+        self.mean = mean
+        self.scale = scale
+        self.batched = True
+        # a first run on a blank frame gives the number of keypoints, and warms the network up
+        width, height = input_size
+        self.keypoints = keypoint_names(len(self.forward(np.zeros((height, width, 3), np.uint8))))
+
+    def forward(self, image):
+        blob = cv2.dnn.blobFromImage(image, self.scale, self.input_size, self.mean, swapRB=True)
+        self.net.setInput(blob)
+        return self.net.forward()[0]
+
+    def infer(self, image, overlay):
+        heatmaps = self.forward(image)
+        keypoints = decode_heatmaps(heatmaps, image.shape[1], image.shape[0], self.threshold)
+        draw_overlay(image, keypoints, overlay)
+        return keypoints
+
+    def infer_batch(self, images, overlay) -> list:
+        if self.batched and len(images) > 1:
+            blob = cv2.dnn.blobFromImages(list(images), self.scale, self.input_size, self.mean, swapRB=True)
+            self.net.setInput(blob)
+            try:
+                heatmaps = self.net.forward()
+            except cv2.error:
+                self.batched = False  # the model has a fixed batch size of 1
+            else:
+                height, width = images[0].shape[:2]
+                return [decode_heatmaps(h, width, height, self.threshold) for h in heatmaps]
+        return super().infer_batch(images, overlay)
+
+
+class StubEstimator(PoseEstimator):
+    """
+    Deterministic stand-in for a network: every person is a ring of COCO keypoints turning
+    with the frame count. It runs anywhere, in microseconds, for tests and benchmarks of
+    the capture and output stages.
+    """
+
+    name = "stub"
+
+    def __init__(self, threshold=0.15, persons=1):
+        super().__init__(threshold)
+        self.persons = persons
+        self.keypoints = list(COCO_KEYPOINTS)
+        self.angles = np.linspace(0, 2 * np.pi, len(self.keypoints), endpoint=False)
+        self.person = np.repeat(np.arange(persons), len(self.keypoints))
+        self.keypoint = np.tile(np.arange(len(self.keypoints)), persons)
+
+    def infer(self, image, overlay):
+        height, width = image.shape[:2]
+        keypoints = np.empty(len(self.person), KEYPOINT_DTYPE)
+        keypoints["person"] = self.person
+        keypoints["keypoint"] = self.keypoint
+        angles = self.angles[self.keypoint] + self.frames / 30
+        radius = min(width / self.persons, height) / 4
+        centers = (self.person + 0.5) * width / self.persons
+        keypoints["x"] = centers + radius * np.cos(angles)
+        keypoints["y"] = height / 2 + radius * np.sin(angles)
+        keypoints["confidence"] = 1.0
+        draw_overlay(image, keypoints, overlay)
+        return keypoints
+
+
+def keypoint_names(n) -> list:
+    if n == len(COCO_KEYPOINTS): return list(COCO_KEYPOINTS)
+    return [f"keypoint_{i}" for i in range(n)]
+
+
+def decode_heatmaps(heatmaps, width, height, threshold):
+    """
+    Method that places one keypoint at the maximum of each heatmap, scaled to the image size.
+
+    :return: ndarray: one KEYPOINT_DTYPE row per heatmap whose maximum is above threshold
+    """
+    n, rows, cols = heatmaps.shape
+    flat = heatmaps.reshape(n, -1)
+    best = flat.argmax(axis=1)
+    confidence = flat[np.arange(n), best]
+    found = np.flatnonzero(confidence >= threshold)
+    keypoints = np.empty(len(found), KEYPOINT_DTYPE)
+    keypoints["person"] = 0
+    keypoints["keypoint"] = found
+    keypoints["x"] = (best[found] % cols + 0.5) * width / cols
+    keypoints["y"] = (best[found] // cols + 0.5) * height / rows
+    keypoints["confidence"] = confidence[found]
+    return keypoints
+
+
+def draw_overlay(image, keypoints, overlay) -> None:
+    """
+    Method that draws the keypoints and the COCO links between them on a BGR image, like the poseNet overlay flags.
+
+    :return: None
+    """
+    if not overlay or overlay == "none" or not isinstance(image, np.ndarray) or len(keypoints) == 0: return
+    points = {(int(k["person"]), int(k["keypoint"])): (int(k["x"]), int(k["y"])) for k in keypoints}
+    if "links" in overlay:
+        for person in set(p for p, _ in points):
+            for a, b in COCO_LINKS:
+                if (person, a) in points and (person, b) in points:
+                    cv2.line(image, points[person, a], points[person, b], (0, 255, 0), 2)
+    if "keypoints" in overlay:
+        for point in points.values():
+            cv2.circle(image, point, 4, (0, 0, 255), -1)
+
+
+def open_estimator(backend, network="resnet18-body", threshold=0.15, model=None, argv=None) -> PoseEstimator:
+    """
+    Method that loads the network of a pose backend.
+
+    :return: PoseEstimator: the loaded backend, raises ValueError for unknown backends or a missing --model
+    """
+    if backend == "posenet":
+        return PoseNetEstimator(network, threshold, argv)
+    if backend == "opencv":
+        if model is None:
+            raise ValueError("The opencv backend needs an ONNX model, see --model")
+        return OpenCvEstimator(model, threshold)
+    if backend == "stub":
+        return StubEstimator(threshold)
+    raise ValueError(f"Unknown pose backend {backend!r}, expected one of {BACKENDS}")
@@ -0,0 +1,234 @@
+import csv
+import importlib.util
+import json
+import os
+import struct
+import time
+import numpy as np
+
+POSE_DTYPE = np.dtype([
+    ("frame", "<i4"),
+    ("person", "<i2"),
+    ("keypoint", "<i2"),
+    ("x", "<f4"),
+    ("y", "<f4"),
+    ("confidence", "<f4"),
+])
+COLUMNS = POSE_DTYPE.names
+
+# format: (backend module needed, extension of the file claimed for the output)
+FORMATS = {
+    "npy": (None, "json"),
+    "parquet": ("pyarrow", "parquet"),
+}
+
+NPY_HEADER = 128  # fixed size, so the row count can be patched in place on every flush
+CSV_CHUNK = 65536
+
+
+def check_format(format) -> None:
+    """
+    Method that checks that a pose output format can be written here.
+
+    :return: None, raises ValueError for unknown formats and RuntimeError when its module is missing
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown pose format {format!r}, expected one of {tuple(FORMATS)}")
+    module = FORMATS[format][0]
+    if module is not None and importlib.util.find_spec(module) is None:
+        raise RuntimeError(f"The {format} pose format needs the {module} package")
+
+
+def format_extension(format) -> str:
+    return FORMATS[format][1]
+
+
+def npy_header(dtype, rows) -> bytes:
+    """
+    Method that builds a version 1.0 .npy header of NPY_HEADER bytes for a 1-d array.
+
+    :return: bytes: the header
+    """
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (np.dtype(dtype).str, rows)
+    header = header.ljust(NPY_HEADER - 11) + "\n"
+    return np.lib.format.magic(1, 0) + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+class PoseWriter:
+    """
+    Writes pose keypoints as one row per (frame, person, keypoint).
+
+    Rows are appended to a preallocated buffer of chunk_rows rows and written out as one
+    chunk when the buffer is full or flush_interval seconds after the previous chunk, so a
+    crash loses at most a few seconds of poses.
+    """
+
+    def __init__(self, filename, keypoints, chunk_rows=65536, flush_interval=5.0):
+        self.filename = filename
+        self.keypoints = list(keypoints)
+        self.flush_interval = flush_interval
+        self.buffer = np.zeros(chunk_rows, POSE_DTYPE)
+        self.size = 0
+        self.rows = 0
+        self.last_flush = time.monotonic()
+
+    def append(self, frame, person, keypoint, x, y, confidence=np.nan) -> None:
+        if self.size == len(self.buffer):
+            self.flush()
+        self.buffer[self.size] = (frame, person, keypoint, x, y, confidence)
+        self.size += 1
+
+    def extend(self, frame, person, keypoint, x, y, confidence=np.nan) -> None:
+        """
+        Method that appends columns of rows at once, scalars are repeated over the rows.
+
+        :return: None
+        """
+        columns = np.broadcast_arrays(frame, person, keypoint, x, y, confidence)
+        n = columns[0].size
+        done = 0
+        while done < n:
+            if self.size == len(self.buffer):
+                self.flush()
+            count = min(n - done, len(self.buffer) - self.size)
+            for name, column in zip(COLUMNS, columns):
+                self.buffer[name][self.size:self.size + count] = column.ravel()[done:done + count]
+            self.size += count
+            done += count
+
+    def tick(self) -> None:
+        """
+        Method called once per frame, it writes the buffer out when flush_interval has passed.
+
+        :return: None
+        """
+        if self.size and time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.size:
+            self.write_chunk(self.buffer[:self.size])
+            self.rows += self.size
+            self.size = 0
+        self.last_flush = time.monotonic()
+
+    def write_chunk(self, rows) -> None:
+        pass
+
+    def close(self) -> None:
+        self.flush()
+
+    def paths(self) -> list:
+        return [self.filename]
+
+
+class NpyPoseWriter(PoseWriter):
+    """
+    One .npy file per column next to a JSON header naming the keypoints.
+
+    The chunks are appended to the column files and their headers are rewritten with the
+    new row count, so the files are valid .npy at every flush and load_pose() maps them
+    with np.load(mmap_mode="r") without reading them.
+    """
+
+    def __init__(self, filename, keypoints, chunk_rows=65536, flush_interval=5.0):
+        super().__init__(filename, keypoints, chunk_rows, flush_interval)
+        with open(filename, "w") as f:
+            json.dump({"format": "npy", "keypoints": self.keypoints, "columns": {
+                name: POSE_DTYPE[name].str for name in COLUMNS}}, f)
+        self.files = {}
+        for name in COLUMNS:
+            self.files[name] = open(self.column_path(filename, name), "wb")
+            self.files[name].write(npy_header(POSE_DTYPE[name], 0))
+
+    @staticmethod
+    def column_path(filename, column) -> str:
+        return f"{os.path.splitext(filename)[0]}.{column}.npy"
+
+    def write_chunk(self, rows) -> None:
+        total = self.rows + len(rows)
+        for name, f in self.files.items():
+            f.seek(0, os.SEEK_END)
+            f.write(rows[name].tobytes())
+            f.seek(0)
+            f.write(npy_header(POSE_DTYPE[name], total))
+            f.flush()
+
+    def close(self) -> None:
+        super().close()
+        for f in self.files.values():
+            f.close()
+
+    def paths(self) -> list:
+        return [self.filename] + [self.column_path(self.filename, name) for name in COLUMNS]
+
+
+class ParquetPoseWriter(PoseWriter):
+    """
+    Parquet file with one row group per chunk, the keypoint names are kept in the schema metadata.
+    """
+
+    def __init__(self, filename, keypoints, chunk_rows=65536, flush_interval=5.0):
+        import pyarrow as pa  # optional, only needed for this format
+        import pyarrow.parquet as pq
+        super().__init__(filename, keypoints, chunk_rows, flush_interval)
+        self.pa = pa
+        self.schema = pa.schema(
+            [(name, pa.from_numpy_dtype(POSE_DTYPE[name])) for name in COLUMNS],
+            metadata={"keypoints": json.dumps(self.keypoints)})
+        self.writer = pq.ParquetWriter(filename, self.schema)
+
+    def write_chunk(self, rows) -> None:
+        table = self.pa.Table.from_arrays([rows[name].copy() for name in COLUMNS], schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        super().close()
+        self.writer.close()
+
+
+def open_pose_writer(filename, keypoints, format="npy", chunk_rows=65536, flush_interval=5.0) -> PoseWriter:
+    """
+    Method that opens the writer of a pose output format.
+
+    :return: PoseWriter: the opened writer
+    """
+    check_format(format)
+    if format == "parquet":
+        return ParquetPoseWriter(filename, keypoints, chunk_rows, flush_interval)
+    return NpyPoseWriter(filename, keypoints, chunk_rows, flush_interval)
+
+
+def load_pose(filename):
+    """
+    Method that loads a pose output, the .npy columns are memory-mapped.
+
+    :return: tuple: (dict of column name to 1-d array, list of keypoint names)
+    """
+    if filename.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        table = pq.read_table(filename)
+        keypoints = json.loads(table.schema.metadata[b"keypoints"])
+        return {name: table.column(name).to_numpy() for name in COLUMNS}, keypoints
+    with open(filename) as f:
+        header = json.load(f)
+    columns = {name: np.load(NpyPoseWriter.column_path(filename, name), mmap_mode="r") for name in COLUMNS}
+    return columns, header["keypoints"]
+
+
+def export_csv(filename, csv_filename) -> int:
+    """
+    Method that converts a pose output to CSV, one line per (frame, person, keypoint).
+
+    :return: int: the number of rows written
+    """
+    columns, keypoints = load_pose(filename)
+    with open(csv_filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("frame", "person", "keypoint", "name", "x", "y", "confidence"))
+        for start in range(0, len(columns["frame"]), CSV_CHUNK):
+            rows = zip(*(columns[name][start:start + CSV_CHUNK].tolist() for name in COLUMNS))
+            for frame, person, keypoint, x, y, confidence in rows:
+                name = keypoints[keypoint] if 0 <= keypoint < len(keypoints) else ""
+                writer.writerow((frame, person, keypoint, name, x, y, confidence))
+    return len(columns["frame"])
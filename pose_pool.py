@@ -0,0 +1,138 @@
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from icecream import ic
+from pose_estimators import open_estimator
+
+POSE_MANIFEST = "pose_manifest.jsonl"
+
+# the model of the current process, loaded once by init_worker
+estimator = None
+
+
+class PoseManifest:
+    """
+    Clips already processed in a folder, one JSON line per clip in pose_manifest.jsonl.
+
+    A line is only appended, and synced, once the pose output of its clip is closed, so a
+    clip interrupted halfway has no line and is processed again on the next run. Clips whose
+    pose output has since been deleted are processed again as well.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.filename = os.path.join(path, POSE_MANIFEST)
+        self.truncated = False
+        self.done = self.load()
+
+    def load(self) -> dict:
+        done = {}
+        if not os.path.exists(self.filename): return done
+        with open(self.filename) as f:
+            for line in f:
+                self.truncated = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash
+                if os.path.exists(os.path.join(self.path, entry["pose"])):
+                    done[entry["clip"]] = entry
+        return done
+
+    def is_done(self, clip) -> bool:
+        return os.path.basename(clip) in self.done
+
+    def record(self, entry) -> None:
+        self.done[entry["clip"]] = entry
+        with open(self.filename, "a") as f:
+            if self.truncated:
+                f.write("\n")
+                self.truncated = False
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def init_worker(backend, network, threshold, model) -> None:
+    global estimator
+    estimator = open_estimator(backend, network, threshold, model)
+
+
+def run_clip(clip, pose_filename, format, batch_size) -> dict:
+    """
+    Method run by a worker on one clip with the model of its process.
+
+    :return: dict: the stats of analyze_clip, with the worker pid and the pose output name
+    """
+    from frame_analyzer import analyze_clip  # frame_analyzer imports this module
+    stats = analyze_clip(clip, estimator, pose_filename, format, batch_size)
+    stats["pose"] = os.path.basename(pose_filename)
+    stats["worker"] = os.getpid()
+    return stats
+
+
+def run_clips(clips, pose_paths, manifest, workers=1, backend="posenet", network="resnet18-body",
+              threshold=0.15, model=None, format="npy", batch_size=8) -> list:
+    """
+    Method that extracts the poses of the clips not in the manifest yet, on a pool of
+    worker processes each loading the model once, or in this process when workers is 1.
+
+    :return: list: the stats of every clip processed by this run
+    """
+    todo = [(clip, pose) for clip, pose in zip(clips, pose_paths) if not manifest.is_done(clip)]
+    if len(todo) < len(clips):
+        print(f"{len(clips) - len(todo)} clips already done in {manifest.filename}, skipping them")
+    results = []
+
+    def done(stats) -> None:
+        manifest.record({key: stats[key] for key in ("clip", "pose", "frames", "seconds", "fps")})
+        results.append(stats)
+        print("{clip}: {frames} frames, {fps} FPS | decode {decode_s}s, wait {wait_s}s, infer {infer_s}s, write {write_s}s".format(**stats))
+
+    if workers <= 1:
+        init_worker(backend, network, threshold, model)
+        try:
+            for clip, pose in todo:
+                try:
+                    done(run_clip(clip, pose, format, batch_size))
+                except Exception as e:
+                    ic('pose extraction failed:', clip, e)
+        finally:
+            estimator.close()
+        return results
+
+    # spawn, so that no worker inherits the CUDA context or the threads of this process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, context, init_worker, (backend, network, threshold, model)) as pool:
+        futures = {pool.submit(run_clip, clip, pose, format, batch_size): clip for clip, pose in todo}
+        try:
+            for future in as_completed(futures):
+                try:
+                    done(future.result())
+                except Exception as e:
+                    ic('pose extraction failed:', futures[future], e)
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+    return results
+
+
+def report(results, seconds) -> None:
+    """
+    Method that prints the throughput of every worker and of the whole run.
+
+    :return: None
+    """
+    workers = {}
+    for stats in results:
+        worker = workers.setdefault(stats.get("worker", os.getpid()), {"clips": 0, "frames": 0, "seconds": 0.0})
+        worker["clips"] += 1
+        worker["frames"] += stats["frames"]
+        worker["seconds"] += stats["seconds"]
+    for pid, worker in sorted(workers.items()):
+        fps = worker["frames"] / worker["seconds"] if worker["seconds"] else 0.0
+        print(f"worker {pid}: {worker['clips']} clips, {worker['frames']} frames in {worker['seconds']:.1f}s, {fps:.1f} FPS")
+    frames = sum(stats["frames"] for stats in results)
+    fps = frames / seconds if seconds else 0.0
+    print(f"{len(results)} clips: {frames} frames in {seconds:.1f}s wall clock, {fps:.1f} FPS")
@@ -0,0 +1,85 @@
+import threading
+import numpy as np
+
+
+class PrerollBuffer:
+    """
+    Ring of the last frames captured before a recording starts.
+
+    The ring is a single preallocated array sized from seconds * fps and capped at max_bytes,
+    so keeping the pre-roll costs one copy per frame and no allocation. It is filled by the
+    capture thread and drained by the encoder thread; pushes are ignored while a drain is
+    in progress so the frames being written are never overwritten.
+    """
+
+    def __init__(self, seconds=0.0, fps=16.0, max_bytes=256 * 1024 * 1024):
+        self.seconds = seconds
+        self.fps = fps
+        self.max_bytes = max_bytes
+        self.frames = None
+        self.timestamps = None
+        self.capacity = 0
+        self.count = 0
+        self.head = 0
+        self.draining = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return self.seconds > 0
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self.frames is None else self.frames.nbytes
+
+    def allocate(self, frame) -> None:
+        wanted = int(self.seconds * self.fps)
+        self.capacity = max(1, min(wanted, self.max_bytes // frame.nbytes))
+        self.frames = np.empty((self.capacity,) + frame.shape, frame.dtype)
+        self.timestamps = np.zeros(self.capacity, np.int64)
+        self.count = 0
+        self.head = 0
+
+    def push(self, frame, timestamp) -> None:
+        if self.draining.is_set(): return
+        if self.frames is None or self.frames.shape[1:] != frame.shape or self.frames.dtype != frame.dtype:
+            self.allocate(frame)
+        np.copyto(self.frames[self.head], frame)
+        self.timestamps[self.head] = timestamp
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity: self.count += 1
+
+    @property
+    def oldest_timestamp(self):
+        if self.count == 0: return None
+        return int(self.timestamps[(self.head - self.count) % self.capacity])
+
+    def begin_drain(self) -> int:
+        """
+        Method that freezes the ring until drain() has run.
+
+        :return: int: the number of frames that drain() will hand out
+        """
+        self.draining.set()
+        return self.count
+
+    def drain(self):
+        """
+        Method that yields the buffered (frame, timestamp) pairs oldest first, then empties the ring.
+
+        :return: generator
+        """
+        try:
+            start = (self.head - self.count) % self.capacity if self.capacity else 0
+            for i in range(self.count):
+                slot = (start + i) % self.capacity
+                yield self.frames[slot], int(self.timestamps[slot])
+        finally:
+            self.count = 0
+            self.draining.clear()
+
+    def stats(self) -> dict:
+        return {
+            "preroll_frames": self.count,
+            "preroll_capacity": self.capacity,
+            "preroll_bytes": self.nbytes,
+        }
@@ -0,0 +1,161 @@
+import threading
+import time
+import tkinter as tk
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+class FrameMailbox:
+    """
+    Single-slot mailbox holding the latest frame: a new frame replaces the one that has not
+    been taken yet. Frames are copied into two reused buffers, the producer fills one
+    while the consumer works on the other.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.buffers = [None, None]
+        self.full = False
+        self.closed = False
+        self.overwritten = 0
+
+    def put(self, frame) -> None:
+        with self.cond:
+            if self.closed: return
+            buf = self.buffers[0]
+            if buf is None or buf.shape != frame.shape or buf.dtype != frame.dtype:
+                buf = self.buffers[0] = np.empty_like(frame)
+            np.copyto(buf, frame)
+            if self.full: self.overwritten += 1
+            self.full = True
+            self.cond.notify()
+
+    def get(self):
+        """
+        Method that waits for a frame; the frame stays valid until the next get().
+
+        :return: ndarray, None once the mailbox is closed
+        """
+        with self.cond:
+            while not self.full and not self.closed:
+                self.cond.wait()
+            if self.closed: return None
+            self.buffers[0], self.buffers[1] = self.buffers[1], self.buffers[0]
+            self.full = False
+            return self.buffers[1]
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+
+class PreviewRenderer:
+    """
+    Shows the camera preview on a Tk canvas without doing image work on the Tk thread.
+
+    The capture thread drops frames into a FrameMailbox. A worker thread takes the latest
+    one at most fps times per second, independently of the recording fps, scales it to the
+    canvas and converts it to an RGB PIL image. Frames arriving in between are skipped. The
+    worker only stores the latest image, it never calls Tk: a Tk call from another thread
+    blocks until the Tk thread serves it, which deadlocks the worker once mainloop has
+    returned. The Tk thread polls for the image with root.after, twice per preview
+    interval, and only pastes it into the single PhotoImage of the canvas. The time it
+    spends doing that is measured and passed to on_rendered.
+    """
+
+    def __init__(self, canvas, fps=15.0):
+        self.canvas = canvas
+        self.interval = 1.0 / fps if fps > 0 else 0.0
+        self.poll_ms = max(5, int(self.interval * 500))
+        self.size = (int(canvas["width"]), int(canvas["height"]))
+        self.mailbox = FrameMailbox()
+        self.lock = threading.Lock()
+        self.image = None
+        self.photo = None
+        self.item = None
+        self.on_rendered = None
+
+        self.frames_converted = 0
+        self.frames_drawn = 0
+        self.ui_ms = 0.0
+        self.canvas.bind("<Configure>", self.resize)
+        self.canvas.after(self.poll_ms, self.poll)
+        self.worker = threading.Thread(target=self.convert_frames, daemon=True)
+        self.worker.start()
+
+    def submit(self, frame) -> None:
+        """
+        Method called from the capture thread with the latest frame, the frame is copied.
+
+        :return: None
+        """
+        self.mailbox.put(frame)
+
+    def resize(self, event) -> None:
+        self.size = (event.width, event.height)
+
+    def convert_frames(self) -> None:
+        """
+        Method run by the worker thread: scales and converts the latest frame for the canvas.
+
+        :return: None
+        """
+        scaled = None
+        while True:
+            start = time.perf_counter()
+            frame = self.mailbox.get()
+            if frame is None: break
+            width, height = self.size
+            scale = min(width / frame.shape[1], height / frame.shape[0])
+            size = (max(1, int(frame.shape[1] * scale)), max(1, int(frame.shape[0] * scale)))
+            if scaled is None or scaled.shape[1::-1] != size:
+                scaled = np.empty((size[1], size[0], 3), np.uint8)
+            cv2.resize(frame, size, dst=scaled, interpolation=cv2.INTER_AREA)
+            # a new array per image, the Tk thread may still be pasting the previous one
+            image = Image.fromarray(cv2.cvtColor(scaled, cv2.COLOR_BGR2RGB))
+            self.frames_converted += 1
+
+            with self.lock:
+                self.image = image
+            time.sleep(max(0.0, self.interval - (time.perf_counter() - start)))
+
+    def poll(self) -> None:
+        self.render()
+        try:
+            self.canvas.after(self.poll_ms, self.poll)
+        except tk.TclError:
+            pass  # the window is gone
+
+    def render(self) -> None:
+        with self.lock:
+            image = self.image
+            self.image = None
+        if image is None: return
+
+        start = time.perf_counter()
+        if self.photo is None or (self.photo.width(), self.photo.height()) != image.size:
+            self.photo = ImageTk.PhotoImage(image=image)
+            if self.item is None:
+                self.item = self.canvas.create_image(0, 0, anchor=tk.NW, image=self.photo)
+            else:
+                self.canvas.itemconfig(self.item, image=self.photo)
+        else:
+            self.photo.paste(image)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.ui_ms = elapsed_ms if self.frames_drawn == 0 else 0.9 * self.ui_ms + 0.1 * elapsed_ms
+        self.frames_drawn += 1
+        if self.on_rendered is not None:
+            self.on_rendered(self.stats())
+
+    def close(self) -> None:
+        self.mailbox.close()
+        self.worker.join()
+
+    def stats(self) -> dict:
+        return {
+            "preview_drawn": self.frames_drawn,
+            "preview_skipped": self.mailbox.overwritten,
+            "preview_ui_ms": round(self.ui_ms, 2),
+        }
@@ -0,0 +1,78 @@
+import threading
+import time
+from metrics import Histogram
+
+IDLE = "idle"
+PREVIEW = "preview"
+COUNTDOWN = "countdown"
+RECORDING = "recording"
+ROTATING = "rotating"
+STOPPING = "stopping"
+STATES = (IDLE, PREVIEW, COUNTDOWN, RECORDING, ROTATING, STOPPING)
+
+TRANSITIONS = {
+    IDLE: (PREVIEW,),
+    PREVIEW: (COUNTDOWN, RECORDING, STOPPING),
+    COUNTDOWN: (RECORDING, PREVIEW, STOPPING),
+    RECORDING: (ROTATING, PREVIEW, STOPPING),
+    ROTATING: (COUNTDOWN, RECORDING, PREVIEW, STOPPING),
+    STOPPING: (IDLE,),
+}
+
+
+class RecordingState:
+    """
+    State of a camera: IDLE -> PREVIEW -> (COUNTDOWN ->) RECORDING -> ROTATING -> ... -> STOPPING -> IDLE.
+
+    Transitions are compare-and-set under a short lock and only succeed along TRANSITIONS,
+    so two requests racing for the same camera cannot both win. Readers such as the capture
+    loop only read the current attribute. Each transition can be given the monotonic_ns
+    at which it was requested, and the time it took to apply is recorded per transition.
+    """
+
+    def __init__(self):
+        self.current = IDLE
+        self.entered_ns = time.monotonic_ns()
+        self.cond = threading.Condition()
+        self.latency = {}
+
+    def transition(self, target, requested_ns=None, expected=None) -> bool:
+        """
+        Method that moves to target if it is reachable from the current state (and the current state is expected, when given).
+
+        :return: bool: True if the transition happened
+        """
+        with self.cond:
+            if expected is not None and self.current != expected: return False
+            if target not in TRANSITIONS[self.current]: return False
+            now = time.monotonic_ns()
+            if requested_ns is not None:
+                key = f"{self.current}->{target}"
+                if key not in self.latency:
+                    self.latency[key] = Histogram()
+                self.latency[key].record(now - requested_ns)
+            self.current = target
+            self.entered_ns = now
+            self.cond.notify_all()
+        return True
+
+    def wait(self, states, timeout=None) -> bool:
+        """
+        Method that blocks until the state is one of states.
+
+        :return: bool: False if the timeout expired first
+        """
+        return self.wait_until(lambda: self.current in states, timeout)
+
+    def wait_until(self, predicate, timeout=None) -> bool:
+        """
+        Method that blocks until predicate() is true, it is checked again after every transition.
+
+        :return: bool: False if the timeout expired first
+        """
+        with self.cond:
+            return self.cond.wait_for(predicate, timeout)
+
+    def stats(self) -> dict:
+        with self.cond:
+            return {key: hist.snapshot() for key, hist in self.latency.items()}
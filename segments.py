@@ -0,0 +1,206 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import numpy as np
+
+SIDECAR_SUFFIX = ".timestamps.npy"
+
+
+def sidecar_path(filename) -> str:
+    """
+    Method that gives the path of the timestamp sidecar of a clip, e.g. output_000.mp4.timestamps.npy.
+
+    :return: str: the sidecar path
+    """
+    return filename + SIDECAR_SUFFIX
+
+
+def load_timestamps(filename):
+    """
+    Method that loads the monotonic_ns timestamps of a clip; element i belongs to video frame i.
+
+    :return: ndarray: int64 timestamps
+    """
+    return np.load(sidecar_path(filename))
+
+
+class Clip:
+    """
+    One output file: the video writer, the timestamps of its frames and what the manifest
+    needs to know about it. The timestamps are saved next to the video on close.
+
+    Instead of a writer the clip can be given an opener, it then opens its writer on the
+    first write, i.e. on the encoder thread, and a clip that got no frame leaves no file.
+
+    index is the position of the clip in its recording (the clip k of a ClipSchedule), it
+    pairs the clips of several cameras even when one of them skipped a clip.
+    """
+
+    def __init__(self, writer, filename, on_closed=None, capacity=1024, opener=None, index=None):
+        self.writer = writer
+        self.opener = opener
+        self.filename = filename
+        self.on_closed = on_closed
+        self.index = index
+        self.first_frame = 0
+        self.frames = 0
+        self.timestamps = np.empty(capacity, np.int64)
+
+    @property
+    def start(self):
+        return int(self.timestamps[0]) if self.frames else None
+
+    @property
+    def end(self):
+        return int(self.timestamps[self.frames - 1]) if self.frames else None
+
+    def open(self) -> None:
+        if self.writer is None:
+            self.writer = self.opener()
+
+    def write(self, frame, timestamp) -> None:
+        if self.writer is None: self.open()
+        self.writer.write(frame)
+        if self.frames == len(self.timestamps):
+            self.timestamps = np.resize(self.timestamps, 2 * len(self.timestamps))
+        self.timestamps[self.frames] = timestamp
+        self.frames += 1
+
+    def close(self) -> None:
+        if self.writer is None:
+            # never opened, drop the name reserved for it
+            if os.path.exists(self.filename): os.remove(self.filename)
+            return
+        self.writer.release()
+        np.save(sidecar_path(self.filename), self.timestamps[:self.frames])
+        if self.on_closed is not None:
+            self.on_closed(self)
+
+    def entry(self) -> dict:
+        """
+        Method that describes the clip for the manifest.
+
+        :return: dict: file name, first/last frame of the stream and start/end monotonic_ns timestamps
+        """
+        return {
+            "file": os.path.basename(self.filename),
+            "first_frame": self.first_frame,
+            "last_frame": self.first_frame + self.frames - 1,
+            "frames": self.frames,
+            "start": self.start,
+            "end": self.end,
+        }
+
+
+class SegmentedRecorder:
+    """
+    Continuous recorder that cuts the stream into segments without losing frames.
+
+    Segments are either exactly frames_per_segment frames long, or cut on a grid of
+    duration_ns monotonic nanoseconds starting at origin_ns (the first frame by default),
+    so recorders sharing an origin cut their segments at the same instants.
+
+    The next clip is opened by a helper thread ahead of the boundary and the finished
+    one is released by the same thread, so the encoder switches writers between two
+    consecutive frames without waiting on file creation or on the mp4 finalisation.
+    """
+
+    def __init__(self, open_clip, frames_per_segment=0, duration_ns=0, origin_ns=None,
+                 preopen_frames=16, preopen_ns=1_000_000_000):
+        if frames_per_segment <= 0 and duration_ns <= 0:
+            raise ValueError("Segments need either a frame count or a duration")
+        self.open_clip = open_clip
+        self.frames_per_segment = int(frames_per_segment)
+        self.duration_ns = int(duration_ns)
+        self.origin_ns = origin_ns
+        self.preopen_at = max(1, self.frames_per_segment - preopen_frames)
+        self.preopen_ns = min(preopen_ns, self.duration_ns // 2)
+        self.boundary = None
+        self.retry_ns = None
+        self.segments = 0
+
+        self.helper = ThreadPoolExecutor(max_workers=1)
+        self.current = None
+        self.next = self.helper.submit(self.open_clip)
+        self.frame_index = 0
+
+    def write(self, frame, timestamp) -> None:
+        if self.current is not None and self.boundary is not None and timestamp >= self.boundary:
+            self.rotate()
+        if self.current is None and not self.start_segment(timestamp): return
+        self.current.write(frame, timestamp)
+        self.frame_index += 1
+
+        if self.next is None and self.preopen_due(timestamp):
+            self.next = self.helper.submit(self.open_clip)
+        if self.frames_per_segment and self.current.frames >= self.frames_per_segment:
+            self.rotate()
+
+    def start_segment(self, timestamp) -> bool:
+        """
+        Method that switches to the pre-opened clip. When it failed to open, the error is raised
+        once and the frames are dropped until a new clip is tried a segment (or a second) later.
+
+        :return: bool: False while waiting to retry
+        """
+        if self.retry_ns is not None and timestamp < self.retry_ns: return False
+        if self.next is None:
+            self.next = self.helper.submit(self.open_clip)
+        future, self.next = self.next, None
+        try:
+            self.current = future.result()
+        except Exception:
+            self.retry_ns = timestamp + (self.duration_ns or 1_000_000_000)
+            raise
+        self.retry_ns = None
+        self.current.first_frame = self.frame_index
+        if self.frames_per_segment:
+            self.current.index = self.segments
+            self.segments += 1
+            return True
+        if self.origin_ns is None:
+            self.origin_ns = timestamp
+        # next grid line after this frame, frames may arrive after one or more empty segments
+        self.current.index = (timestamp - self.origin_ns) // self.duration_ns
+        self.boundary = self.origin_ns + (self.current.index + 1) * self.duration_ns
+        return True
+
+    def preopen_due(self, timestamp) -> bool:
+        if self.frames_per_segment:
+            return self.current.frames >= self.preopen_at
+        return timestamp >= self.boundary - self.preopen_ns
+
+    def rotate(self) -> None:
+        self.helper.submit(self.current.close)
+        self.current = None
+
+    def close(self) -> None:
+        """
+        Method that closes the current segment and throws away the pre-opened one.
+
+        :return: None
+        """
+        if self.current is not None:
+            self.rotate()
+        if self.next is not None:
+            self.helper.submit(self.discard, self.next)
+            self.next = None
+        self.helper.shutdown(wait=True)
+
+    @staticmethod
+    def discard(future) -> None:
+        future.result().writer.discard()
+
+
+class ClipSchedule:
+    """
+    Timetable of the clips shared by several cameras on the monotonic clock: clip k of
+    every camera starts at origin_ns + k * period_ns, so the cameras start and stop
+    their clips together whatever the latency of their capture threads.
+    """
+
+    def __init__(self, origin_ns, period_ns):
+        self.origin_ns = int(origin_ns)
+        self.period_ns = int(period_ns)
+
+    def start(self, index) -> int:
+        return self.origin_ns + index * self.period_ns
@@ -0,0 +1,221 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+from encoders import Encoder, open_encoder
+
+# how long the writers wait on the worker before checking it is still alive
+POLL_S = 0.2
+
+
+def encode_worker(shm_name, n_slots, frame_shape, commands, free, results) -> None:
+    """
+    Method run by the encoder process: it owns the real encoders and reads the frames
+    straight out of the shared ring, the ffmpeg and raw backends hand the ring slot to
+    their pipe/file without copying it.
+
+    :return: None
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = np.ndarray((n_slots,) + frame_shape, np.uint8, buffer=shm.buf)
+    encoders = {}
+    try:
+        while True:
+            command = commands.get()
+            action, clip = command[0], command[1]
+            if action == "frame":
+                slot = command[2]
+                try:
+                    if clip in encoders: encoders[clip].write(ring[slot])
+                finally:
+                    free.put(slot)
+            elif action == "open":
+                try:
+                    encoders[clip] = open_encoder(*command[2:])
+                except Exception as e:
+                    results.put((clip, f"{type(e).__name__}: {e}"))
+            elif action in ("close", "discard"):
+                encoder = encoders.pop(clip, None)
+                error = None
+                try:
+                    if encoder is not None:
+                        encoder.discard() if action == "discard" else encoder.release()
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                results.put((clip, error))
+            elif action == "stop":
+                break
+    finally:
+        for encoder in encoders.values():
+            encoder.release()
+        del ring
+        shm.close()
+
+
+class EncodeProcess:
+    """
+    Encoder worker process fed through a ring of frame slots in shared memory.
+
+    Writing a frame is one copy into a free slot plus a few bytes of command on a queue,
+    compression runs on another core and never holds up the capture or the encoder thread.
+    When every slot is in use the writer waits for the worker, which the FrameQueue in
+    front of it turns into its usual backpressure policy. A worker that dies fails the
+    waiting write or close with a RuntimeError instead of blocking it forever, and the
+    shared ring is released right away.
+    """
+
+    def __init__(self, frame_shape, n_slots=8):
+        self.frame_shape = tuple(frame_shape)
+        self.n_slots = n_slots
+        nbytes = int(np.prod(self.frame_shape)) * n_slots
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self.ring = np.ndarray((n_slots,) + self.frame_shape, np.uint8, buffer=self.shm.buf)
+
+        context = multiprocessing.get_context("spawn")
+        self.commands = context.Queue()
+        self.free = context.Queue()
+        self.results = context.Queue()
+        for slot in range(n_slots):
+            self.free.put(slot)
+        self.process = context.Process(
+            target=encode_worker,
+            args=(self.shm.name, n_slots, self.frame_shape, self.commands, self.free, self.results),
+            daemon=True,
+        )
+        self.process.start()
+
+        self.clip_ids = itertools.count()
+        self.lock = threading.Lock()
+        self.ring_lock = threading.Lock()
+        self.done = {}
+        self.errors = {}
+        self.listener = threading.Thread(target=self.listen, daemon=True)
+        self.listener.start()
+
+    def listen(self) -> None:
+        while True:
+            clip, error = self.results.get()
+            if clip is None: break
+            with self.lock:
+                event = self.done.get(clip)
+                if event is None: continue
+                # keep the first error, an open failure is followed by a clean close
+                self.errors[clip] = self.errors.get(clip) or error
+            event.set()
+
+    def open(self, filename, fps, size, codec, preset) -> int:
+        clip = next(self.clip_ids)
+        with self.lock:
+            self.done[clip] = threading.Event()
+        self.commands.put(("open", clip, filename, fps, size, codec, preset))
+        return clip
+
+    def write(self, clip, frame) -> None:
+        while True:
+            try:
+                slot = self.free.get(timeout=POLL_S)
+                break
+            except queue.Empty:
+                self.check_alive()
+        with self.ring_lock:
+            if self.ring is None: raise RuntimeError(self.exit_message())
+            np.copyto(self.ring[slot], frame)
+        self.commands.put(("frame", clip, slot))
+
+    def finish(self, clip, action="close") -> None:
+        """
+        Method that closes or discards a clip and waits for the worker to finish its file.
+
+        :return: None, raises RuntimeError if the worker failed to open or release the clip
+        """
+        self.commands.put((action, clip))
+        with self.lock:
+            event = self.done[clip]
+        try:
+            while not event.wait(POLL_S):
+                self.check_alive()
+        finally:
+            with self.lock:
+                del self.done[clip]
+                error = self.errors.pop(clip, None)
+        if error is not None:
+            raise RuntimeError(error)
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def exit_message(self) -> str:
+        return f"The encoder process exited with code {self.process.exitcode}"
+
+    def check_alive(self) -> None:
+        """
+        Method that fails a waiting writer once the worker is gone, its slots and results will never come back.
+
+        :return: None, raises RuntimeError if the worker process has exited
+        """
+        if self.process.is_alive(): return
+        self.release_ring()
+        raise RuntimeError(self.exit_message())
+
+    def release_ring(self) -> None:
+        """
+        Method that closes and unlinks the shared ring, once the worker has exited.
+
+        :return: None
+        """
+        with self.ring_lock:
+            if self.ring is None: return
+            self.ring = None
+            self.shm.close()
+            self.shm.unlink()
+        # the worker will never read what is left in the pipe, don't wait for it at exit
+        self.commands.cancel_join_thread()
+
+    def stop(self) -> None:
+        if self.process.is_alive():
+            self.commands.put(("stop", None))
+        self.process.join()
+        self.results.put((None, None))
+        self.listener.join()
+        self.release_ring()
+
+
+class ProcessEncoder(Encoder):
+    """
+    Encoder handle whose frames are compressed by an EncodeProcess.
+    """
+
+    def __init__(self, process, filename, fps, size, codec="mp4v", preset="veryfast"):
+        super().__init__(filename, fps, size)
+        self.process = process
+        self.codec = codec
+        self.clip = process.open(filename, fps, size, codec, preset)
+        self.released = False
+        self.error = None
+
+    def write(self, frame) -> None:
+        # after a failure the clip is lost, report it once rather than for every frame
+        if self.released or self.error is not None: return
+        try:
+            self.process.write(self.clip, frame)
+        except RuntimeError as e:
+            self.error = e
+            raise
+
+    def release(self) -> None:
+        if self.released: return
+        self.released = True
+        if self.error is not None: raise self.error
+        self.process.finish(self.clip)
+
+    def discard(self) -> None:
+        if self.released: return
+        self.released = True
+        try:
+            if self.error is None: self.process.finish(self.clip, "discard")
+        finally:
+            # a dead worker leaves the file behind
+            if os.path.exists(self.filename): os.remove(self.filename)
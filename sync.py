@@ -0,0 +1,170 @@
+import json
+import os
+import threading
+import cv2
+import numpy as np
+from encoders import load_raw
+from output_index import OutputIndex
+
+ALIGN_SUFFIX = ".align.npy"
+SYNC_MANIFEST = "sync_manifest.jsonl"
+MISSING = -1
+
+
+def alignment_dtype(n_cameras):
+    return np.dtype([("timestamp", "<i8"), ("frames", "<i4", (n_cameras,))])
+
+
+def align(timestamps, tolerance_ns=None, reference=None):
+    """
+    Method that matches the frames of several cameras by monotonic timestamp.
+
+    Every frame of the reference camera (by default the one with the fewest frames, empty
+    cameras aside) is a tick; each other camera contributes its frame closest in time to the
+    tick, or MISSING when that frame is further than tolerance_ns away (half a reference
+    frame by default).
+
+    :return: ndarray: one (timestamp, frames) record per tick, frames holds a frame index per camera
+    """
+    timestamps = [np.asarray(t, np.int64) for t in timestamps]
+    if reference is None:
+        reference = int(np.argmin([len(t) or np.inf for t in timestamps]))
+    ticks = timestamps[reference]
+    if tolerance_ns is None:
+        tolerance_ns = int(np.median(np.diff(ticks)) // 2) if len(ticks) > 1 else 0
+
+    index = np.empty(len(ticks), alignment_dtype(len(timestamps)))
+    index["timestamp"] = ticks
+    for camera, stamps in enumerate(timestamps):
+        if len(stamps) == 0:
+            index["frames"][:, camera] = MISSING
+            continue
+        # nearest neighbour: the frame right after the tick or the one before it
+        after = np.clip(np.searchsorted(stamps, ticks), 0, len(stamps) - 1)
+        before = np.clip(after - 1, 0, len(stamps) - 1)
+        nearest = np.where(np.abs(stamps[before] - ticks) <= np.abs(stamps[after] - ticks), before, after)
+        matched = np.abs(stamps[nearest] - ticks) <= tolerance_ns
+        index["frames"][:, camera] = np.where(matched, nearest, MISSING)
+    return index
+
+
+def load_alignment(filename):
+    """
+    Method that memory-maps an alignment index written by FrameSynchronizer.
+
+    :return: ndarray: the (timestamp, frames) records
+    """
+    return np.load(filename, mmap_mode="r")
+
+
+class FrameSynchronizer:
+    """
+    Builds the alignment index of every clip set recorded by a MultiCameraManager.
+
+    Cameras report their clips as they close them, a set is made of the clips with the
+    same clip index. Each camera closes its clips in order, so once every camera has
+    reported clip k or a later one, set k is complete: a camera that got no frame for it
+    (and so never reported it) is MISSING in the set. The frames of the set are matched by
+    timestamp and the index is written next to the clips as sync_000.align.npy, with a
+    line naming the clips in sync_manifest.jsonl. flush() writes the sets still waiting
+    for a camera once the recording is over.
+    """
+
+    def __init__(self, path, n_cameras, tolerance_ns=None):
+        self.path = path
+        self.n_cameras = n_cameras
+        self.tolerance_ns = tolerance_ns
+        self.lock = threading.Lock()
+        # clip index -> {camera: (filename, timestamps)}
+        self.pending = {}
+        self.last_index = [None] * n_cameras
+        self.output_index = OutputIndex(path, "sync_{index:03d}" + ALIGN_SUFFIX)
+
+    def clip_closed(self, camera, clip) -> None:
+        with self.lock:
+            self.pending.setdefault(clip.index, {})[camera] = (clip.filename, clip.timestamps[:clip.frames].copy())
+            self.last_index[camera] = clip.index
+            if None in self.last_index: return
+            ready = [k for k in sorted(self.pending) if k <= min(self.last_index)]
+            # named under the lock so the sets are numbered in clip order
+            clip_sets = [(self.output_index.claim(), k, self.pending.pop(k)) for k in ready]
+        for filename, k, clips in clip_sets:
+            self.write(filename, k, clips)
+
+    def flush(self) -> None:
+        """
+        Method that writes the sets still waiting for a camera, that camera is MISSING in them.
+
+        :return: None
+        """
+        with self.lock:
+            clip_sets = [(self.output_index.claim(), k, self.pending.pop(k)) for k in sorted(self.pending)]
+        for filename, k, clips in clip_sets:
+            self.write(filename, k, clips)
+
+    def write(self, filename, clip, clips) -> None:
+        """
+        Method that aligns one clip set and saves its index.
+
+        :return: None
+        """
+        clip_set = [clips.get(camera, (None, np.empty(0, np.int64))) for camera in range(self.n_cameras)]
+        index = align([timestamps for _, timestamps in clip_set], self.tolerance_ns)
+        np.save(filename, index)
+        entry = {
+            "index": os.path.basename(filename),
+            "clip": clip,
+            "files": [name and os.path.basename(name) for name, _ in clip_set],
+            "ticks": len(index),
+            "complete": int(np.all(index["frames"] != MISSING, axis=1).sum()),
+        }
+        with self.lock:
+            with open(os.path.join(self.path, SYNC_MANIFEST), "a") as f:
+                f.write(json.dumps(entry) + "\n")
+
+
+class ClipReader:
+    """
+    Reads the frames of a clip in increasing order, the raw dumps are memory-mapped instead.
+    """
+
+    def __init__(self, filename):
+        self.frames = load_raw(filename) if filename.endswith(".raw") else None
+        self.capture = None if self.frames is not None else cv2.VideoCapture(filename)
+        self.position = -1
+        self.frame = None
+
+    def read(self, i):
+        if i == MISSING: return None
+        if self.frames is not None: return self.frames[i]
+        while self.position < i:
+            ret, frame = self.capture.read()
+            if not ret: return None
+            self.frame = frame
+            self.position += 1
+        return self.frame
+
+    def release(self) -> None:
+        if self.capture is not None:
+            self.capture.release()
+
+
+def synchronized_frames(path="./"):
+    """
+    Method that walks the clip sets of a recording folder tick by tick, without re-scanning
+    the videos: each clip is read once, front to back, following its alignment index.
+
+    :return: generator of (timestamp, frames) where frames holds one image per camera, None where a camera has no match
+    """
+    with open(os.path.join(path, SYNC_MANIFEST)) as f:
+        entries = [json.loads(line) for line in f]
+    for entry in entries:
+        index = load_alignment(os.path.join(path, entry["index"]))
+        # a camera without a clip in the set has no file, its frames are all MISSING
+        readers = [ClipReader(os.path.join(path, name)) if name else None for name in entry["files"]]
+        try:
+            for timestamp, frames in index:
+                yield int(timestamp), tuple(reader and reader.read(int(i)) for reader, i in zip(readers, frames))
+        finally:
+            for reader in readers:
+                if reader is not None: reader.release()
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from camera import CameraManager
+from events import COUNTDOWN as COUNTDOWN_EVENT, ERROR, START, STOP
+from frame_source import SyntheticSource
+from recording_state import RecordingState, IDLE, PREVIEW, COUNTDOWN, RECORDING, STOPPING
+from segments import ClipSchedule, load_timestamps
+
+
+def make_camera(tmp_path, **kwargs):
+    return CameraManager(path=str(tmp_path), cam="synthetic:64x48@30", fps=30, codec="raw", realtime=False, **kwargs)
+
+
+def test_scheduled_clips_hold_only_their_own_frames(tmp_path):
+    cam = make_camera(tmp_path, n_loop=3)
+    cam.start_camera()
+    try:
+        assert cam.wait_ready(5)
+        cam.schedule = ClipSchedule(time.monotonic_ns() + 20_000_000, 30_000_000)
+        cam.start_recording()
+        assert cam.wait_recording_done(10)
+    finally:
+        cam.close_camera()
+    for k in range(3):
+        timestamps = load_timestamps(os.path.join(tmp_path, f"output_{k:03d}.raw"))
+        assert len(timestamps) > 0
+        assert timestamps[0] >= cam.schedule.start(k)
+        assert timestamps[-1] < cam.schedule.start(k + 1)
+
+
+def test_recording_state_only_follows_the_transition_table():
+    state = RecordingState()
+    assert not state.transition(RECORDING)
+    assert state.transition(PREVIEW, time.monotonic_ns())
+    assert not state.transition(RECORDING, expected=COUNTDOWN)
+    assert state.transition(RECORDING, expected=PREVIEW)
+    assert not state.transition(IDLE)
+    assert state.transition(STOPPING) and state.transition(IDLE)
+    assert state.current == IDLE
+    # only the transitions given a request time are measured
+    assert list(state.stats()) == ["idle->preview"]
+
+
+def test_wait_until_wakes_up_on_a_transition():
+    state = RecordingState()
+    timer = threading.Timer(0.05, state.transition, (PREVIEW,))
+    timer.start()
+    assert state.wait([PREVIEW], timeout=5)
+    assert not state.wait([RECORDING], timeout=0.01)
+
+
+def test_camera_goes_through_preview_recording_and_back(tmp_path):
+    cam = make_camera(tmp_path, n_loop=1, vid_dur=60)
+    seen = []
+    cam.events.subscribe(START, lambda: seen.append(cam.state.current), sync=True)
+    cam.start_camera()
+    try:
+        assert cam.wait_ready(5)
+        assert cam.state.current == PREVIEW and not cam.is_recording()
+        cam.start_recording()
+        assert cam.state.wait([RECORDING], timeout=5)
+        assert seen == [RECORDING]
+        cam.stop_recording()
+        assert cam.state.wait([PREVIEW], timeout=5)
+    finally:
+        cam.close_camera()
+    assert cam.state.current == IDLE and not cam.is_running()
+    transitions = cam.stats()["transitions"]
+    assert {"preview->recording", "recording->preview", "preview->stopping"} <= set(transitions)
+    assert os.path.exists(os.path.join(tmp_path, "output_000.raw"))
+
+
+def test_countdown_ticks_on_the_frame_clock(tmp_path):
+    cam = make_camera(tmp_path, n_loop=1, vid_dur=0.05, countdown=1)
+    ticks = []
+    cam.events.subscribe(COUNTDOWN_EVENT, ticks.append, sync=True)
+    cam.start_camera()
+    try:
+        assert cam.wait_ready(5)
+        cam.start_recording()
+        assert cam.state.wait([COUNTDOWN, RECORDING], timeout=5)
+        assert cam.wait_recording_done(10)
+    finally:
+        cam.close_camera()
+    assert ticks == [1]
+    assert "countdown->recording" in cam.stats()["transitions"]
+
+
+class FailingSource(SyntheticSource):
+    def read_frame(self, image):
+        if self.position >= 3: raise RuntimeError("device unplugged")
+        return super().read_frame(image)
+
+
+def test_a_failing_worker_still_stops_the_camera(tmp_path):
+    cam = CameraManager(path=str(tmp_path), cam=FailingSource(64, 48, realtime=False), codec="raw")
+    errors, stops = [], []
+    cam.events.subscribe(ERROR, errors.append, sync=True)
+    cam.events.subscribe(STOP, lambda: stops.append(True), sync=True)
+    cam.start_camera()
+    assert cam.state.wait([IDLE], timeout=5)
+    cam.close_camera()
+    assert len(errors) == 1 and "device unplugged" in errors[0]
+    assert stops == [True]
+    assert cam.frame_queue.closed
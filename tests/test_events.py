@@ -0,0 +1,71 @@
+import threading
+import time
+import numpy as np
+import pytest
+from events import EventBus, ERROR, FRAME_READY
+
+
+def test_a_full_queue_drops_the_oldest_events():
+    bus = EventBus()
+    release = threading.Event()
+    received = []
+
+    def slow(value):
+        release.wait(5)
+        received.append(value)
+
+    subscription = bus.subscribe(ERROR, slow, queue_size=2)
+    bus.publish(ERROR, 0)
+    # wait for the delivery thread to take event 0, so the queue holds the next ones
+    while subscription.pending:
+        time.sleep(0.001)
+    for value in range(1, 5):
+        bus.publish(ERROR, value)
+    release.set()
+    bus.close()
+
+    assert received == [0, 3, 4]
+    stats = subscription.stats()
+    assert stats["delivered"] == 3
+    assert stats["dropped"] == 2
+    assert stats["latency"]["count"] == 3
+
+
+def test_sync_subscribers_run_inline_and_count_handler_time():
+    bus = EventBus()
+    threads = []
+    subscription = bus.subscribe(ERROR, lambda message: threads.append(threading.current_thread()), sync=True)
+    for _ in range(3):
+        bus.publish(ERROR, "boom")
+    assert threads == [threading.current_thread()] * 3
+    stats = bus.stats()[ERROR][0]
+    assert stats["sync"] and stats["delivered"] == 3 and stats["dropped"] == 0
+    assert stats["latency"]["count"] == 3
+    bus.unsubscribe(subscription)
+    bus.publish(ERROR, "boom")
+    assert len(threads) == 3
+
+
+def test_frames_are_copied_for_async_subscribers_only():
+    bus = EventBus()
+    frame = np.zeros((2, 2, 3), np.uint8)
+    sync_frames, async_frames = [], []
+    bus.subscribe(FRAME_READY, sync_frames.append, sync=True)
+    bus.subscribe(FRAME_READY, async_frames.append)
+    bus.publish(FRAME_READY, frame)
+    frame[:] = 9
+    bus.close()
+    assert sync_frames[0] is frame
+    assert async_frames[0] is not frame and async_frames[0].max() == 0
+
+
+def test_failing_handlers_are_counted():
+    bus = EventBus()
+    subscription = bus.subscribe(ERROR, lambda message: 1 / 0, sync=True)
+    bus.publish(ERROR, "boom")
+    assert subscription.stats()["errors"] == 1
+
+
+def test_unknown_events_are_rejected():
+    with pytest.raises(ValueError):
+        EventBus().subscribe("frame", print)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from frame_queue import FrameQueue, DROP_OLDEST, DROP_NEWEST
+
+
+def frame(value):
+    return np.full((2, 2, 3), value, np.uint8)
+
+
+def drain(queue):
+    items = []
+    while len(queue.pending):
+        slot, data, meta = queue.get(timeout=0)
+        items.append(meta if data is None else int(data[0, 0, 0]))
+        queue.release(slot)
+    return items
+
+
+def test_drop_oldest_keeps_the_latest_frames_and_the_markers():
+    queue = FrameQueue(2, DROP_OLDEST)
+    queue.put(frame(1))
+    queue.put_marker("marker")
+    queue.put(frame(2))
+    assert queue.put(frame(3))
+    assert queue.dropped == 1
+    assert drain(queue) == ["marker", 2, 3]
+
+
+def test_drop_newest_refuses_frames_when_full():
+    queue = FrameQueue(2, DROP_NEWEST)
+    assert queue.put(frame(1)) and queue.put(frame(2))
+    assert not queue.put(frame(3))
+    assert queue.dropped == 1
+    assert drain(queue) == [1, 2]
+
+
+def test_frames_are_copied_into_the_slots():
+    queue = FrameQueue(2)
+    buf = frame(5)
+    queue.put(buf)
+    buf[:] = 9
+    assert drain(queue) == [5]
+
+
+def test_closed_queue_returns_none_once_drained():
+    queue = FrameQueue(2)
+    queue.put(frame(1))
+    queue.close()
+    assert not queue.put(frame(2))
+    slot, data, _ = queue.get()
+    queue.release(slot)
+    assert queue.get() is None
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        FrameQueue(2, "drop-everything")
+    with pytest.raises(ValueError):
+        FrameQueue(0)
@@ -0,0 +1,37 @@
+import os
+import pytest
+from output_index import DEFAULT_TEMPLATE, OutputIndex
+
+
+def test_compile_matches_only_the_template():
+    pattern = OutputIndex.compile(DEFAULT_TEMPLATE, {"prefix": "output", "ext": "mp4"})
+    assert pattern.match("output_012.mp4").group(1) == "012"
+    assert pattern.match("output_1234.mp4").group(1) == "1234"
+    assert pattern.match("output_012.mp4.timestamps.npy") is None
+    assert pattern.match("cam0_012.mp4") is None
+
+
+def test_compile_rejects_bad_templates():
+    with pytest.raises(ValueError):
+        OutputIndex.compile("{prefix}.mp4", {"prefix": "output"})
+    with pytest.raises(ValueError):
+        OutputIndex.compile("{index}_{index}.mp4", {})
+    with pytest.raises(ValueError):
+        OutputIndex.compile("{unknown}_{index}.mp4", {})
+
+
+def test_claim_continues_after_the_highest_index(tmp_path):
+    for name in ("output_000.mp4", "output_007.mp4", "other_050.mp4"):
+        (tmp_path / name).touch()
+    index = OutputIndex(str(tmp_path), prefix="output", ext="mp4")
+    assert os.path.basename(index.claim()) == "output_008.mp4"
+    # a file created behind the index's back is skipped, not overwritten
+    (tmp_path / "output_009.mp4").write_text("taken")
+    assert os.path.basename(index.claim()) == "output_010.mp4"
+    assert (tmp_path / "output_009.mp4").read_text() == "taken"
+
+
+def test_claim_in_a_missing_folder_raises_oserror(tmp_path):
+    index = OutputIndex(str(tmp_path / "missing"), prefix="output", ext="mp4")
+    with pytest.raises(OSError):
+        index.claim()
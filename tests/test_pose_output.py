@@ -0,0 +1,81 @@
+import csv
+import numpy as np
+import pytest
+from pose_estimators import StubEstimator
+from pose_output import COLUMNS, NPY_HEADER, check_format, export_csv, load_pose, npy_header, open_pose_writer
+
+
+def test_npy_header_has_a_fixed_size():
+    for rows in (0, 7, 10 ** 12):
+        assert len(npy_header("<f4", rows)) == NPY_HEADER
+
+
+def test_npy_round_trip_across_flushes(tmp_path):
+    filename = str(tmp_path / "pose_000.json")
+    writer = open_pose_writer(filename, ["nose", "eye"], chunk_rows=4, flush_interval=0)
+    for frame in range(5):
+        writer.append(frame, 0, 0, frame * 1.5, frame * 2.5, 0.9)
+        writer.append(frame, 1, 1, frame + 0.25, frame + 0.75)
+    # valid .npy files after every flush, even while the writer is open
+    columns, _ = load_pose(filename)
+    assert len(columns["frame"]) == 8
+    writer.extend(np.arange(5, 15), 2, 1, np.linspace(0, 1, 10), 3.0, 0.5)
+    writer.close()
+
+    columns, keypoints = load_pose(filename)
+    assert keypoints == ["nose", "eye"]
+    assert isinstance(columns["x"], np.memmap)
+    assert len(columns["frame"]) == 20
+    assert columns["frame"].dtype == np.int32 and columns["person"].dtype == np.int16
+    np.testing.assert_array_equal(columns["frame"][:10], np.repeat(np.arange(5), 2))
+    np.testing.assert_array_equal(columns["frame"][10:], np.arange(5, 15))
+    np.testing.assert_allclose(columns["x"][:10:2], np.arange(5) * 1.5)
+    np.testing.assert_allclose(columns["x"][10:], np.linspace(0, 1, 10), rtol=1e-6)
+    assert np.isnan(columns["confidence"][1])
+    assert columns["confidence"][0] == pytest.approx(0.9)
+
+
+def test_tick_flushes_after_the_interval(tmp_path):
+    filename = str(tmp_path / "pose_000.json")
+    writer = open_pose_writer(filename, ["nose"], chunk_rows=100, flush_interval=0)
+    writer.append(0, 0, 0, 1.0, 2.0)
+    writer.tick()
+    assert len(load_pose(filename)[0]["frame"]) == 1
+    writer.close()
+
+
+def test_export_csv(tmp_path):
+    filename = str(tmp_path / "pose_000.json")
+    writer = open_pose_writer(filename, ["nose", "eye"])
+    writer.append(3, 1, 1, 10.5, 20.5, 0.75)
+    writer.append(4, 0, 0, 11.0, 21.0, 1.0)
+    writer.close()
+
+    assert export_csv(filename, str(tmp_path / "pose_000.csv")) == 2
+    with open(tmp_path / "pose_000.csv", newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["frame", "person", "keypoint", "name", "x", "y", "confidence"]
+    assert rows[1] == ["3", "1", "1", "eye", "10.5", "20.5", "0.75"]
+    assert rows[2] == ["4", "0", "0", "nose", "11.0", "21.0", "1.0"]
+
+
+def test_stub_estimator_output_is_deterministic(tmp_path):
+    image = np.zeros((120, 160, 3), np.uint8)
+    runs = []
+    for run in range(2):
+        estimator = StubEstimator(persons=2)
+        filename = str(tmp_path / f"pose_{run:03d}.json")
+        writer = open_pose_writer(filename, estimator.keypoints, chunk_rows=16)
+        for frame, keypoints in enumerate(estimator.process_batch(np.stack([image] * 3))):
+            writer.extend(frame, keypoints["person"], keypoints["keypoint"], keypoints["x"], keypoints["y"], keypoints["confidence"])
+        writer.close()
+        runs.append(load_pose(filename)[0])
+    assert len(runs[0]["frame"]) == 3 * 2 * len(estimator.keypoints)
+    for name in COLUMNS:
+        np.testing.assert_array_equal(runs[0][name], runs[1][name])
+
+
+def test_check_format():
+    check_format("npy")
+    with pytest.raises(ValueError):
+        check_format("hdf5")
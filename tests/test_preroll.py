@@ -0,0 +1,61 @@
+import json
+import os
+import time
+import numpy as np
+from camera import CameraManager
+from preroll import PrerollBuffer
+
+
+def frame(value, shape=(4, 4, 3)):
+    return np.full(shape, value, np.uint8)
+
+
+def test_push_evicts_the_oldest_frames():
+    preroll = PrerollBuffer(seconds=1.0, fps=3)
+    for i in range(5):
+        preroll.push(frame(i), 100 + i)
+    assert preroll.count == preroll.capacity == 3
+    assert preroll.oldest_timestamp == 102
+    assert preroll.begin_drain() == 3
+    assert [(int(f[0, 0, 0]), t) for f, t in preroll.drain()] == [(2, 102), (3, 103), (4, 104)]
+    assert preroll.count == 0
+
+
+def test_capacity_is_capped_by_memory():
+    preroll = PrerollBuffer(seconds=10.0, fps=30, max_bytes=5 * 48)
+    preroll.push(frame(0), 0)
+    assert preroll.capacity == 5
+    assert preroll.nbytes <= 5 * 48
+    # a single frame larger than the cap still keeps one frame
+    preroll = PrerollBuffer(seconds=10.0, fps=30, max_bytes=10)
+    preroll.push(frame(0), 0)
+    assert preroll.capacity == 1
+
+
+def test_pushes_are_ignored_while_draining():
+    preroll = PrerollBuffer(seconds=1.0, fps=2)
+    preroll.push(frame(1), 1)
+    preroll.push(frame(2), 2)
+    preroll.begin_drain()
+    preroll.push(frame(3), 3)
+    assert [t for _, t in preroll.drain()] == [1, 2]
+    preroll.push(frame(4), 4)
+    assert preroll.count == 1 and preroll.oldest_timestamp == 4
+
+
+def test_preroll_comes_on_top_of_a_frame_count_clip(tmp_path):
+    cam = CameraManager(path=str(tmp_path), cam="synthetic:64x48@30", fps=30, codec="raw", realtime=False,
+                        clip_frames=20, preroll=1.0)
+    cam.start_camera()
+    try:
+        assert cam.wait_ready(5)
+        deadline = time.monotonic() + 5
+        while cam.preroll.count < 30 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        cam.start_recording()
+        assert cam.wait_recording_done(10)
+    finally:
+        cam.close_camera()
+    with open(os.path.join(tmp_path, "manifest.jsonl")) as f:
+        entries = [json.loads(line) for line in f]
+    assert [entry["frames"] for entry in entries] == [50]
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from segments import Clip, ClipSchedule, SegmentedRecorder
+
+
+class ListWriter:
+    def __init__(self):
+        self.frames = []
+        self.released = False
+
+    def write(self, frame):
+        self.frames.append(frame)
+
+    def release(self):
+        self.released = True
+
+    def discard(self):
+        self.release()
+
+
+def make_opener(tmp_path, clips):
+    def open_clip():
+        clip = Clip(ListWriter(), str(tmp_path / f"clip_{len(clips):03d}.raw"))
+        clips.append(clip)
+        return clip
+    return open_clip
+
+
+def test_segments_by_frame_count(tmp_path):
+    clips = []
+    recorder = SegmentedRecorder(make_opener(tmp_path, clips), frames_per_segment=3, preopen_frames=1)
+    for i in range(7):
+        recorder.write(np.zeros(1), i)
+    recorder.close()
+    written = [clip for clip in clips if clip.frames]
+    assert [clip.frames for clip in written] == [3, 3, 1]
+    assert [clip.first_frame for clip in written] == [0, 3, 6]
+    assert all(clip.writer.released for clip in clips)
+
+
+def test_segments_on_a_time_grid(tmp_path):
+    clips = []
+    recorder = SegmentedRecorder(make_opener(tmp_path, clips), duration_ns=100, origin_ns=0)
+    for timestamp in (0, 50, 99, 100, 150, 420):
+        recorder.write(np.zeros(1), timestamp)
+    recorder.close()
+    written = [clip for clip in clips if clip.frames]
+    assert [list(clip.timestamps[:clip.frames]) for clip in written] == [[0, 50, 99], [100, 150], [420]]
+
+
+def test_failed_open_is_retried_a_segment_later(tmp_path):
+    clips = []
+    opener = make_opener(tmp_path, clips)
+    failures = [True]
+
+    def open_clip():
+        if failures.pop() if failures else False:
+            raise OSError("read-only")
+        return opener()
+
+    recorder = SegmentedRecorder(open_clip, duration_ns=100, origin_ns=0)
+    with pytest.raises(OSError):
+        recorder.write(np.zeros(1), 0)
+    # dropped without a new error until the retry is due
+    recorder.write(np.zeros(1), 50)
+    recorder.write(np.zeros(1), 100)
+    recorder.close()
+    assert [list(clip.timestamps[:clip.frames]) for clip in clips if clip.frames] == [[100]]
+
+
+def test_clip_schedule():
+    schedule = ClipSchedule(1_000, 500)
+    assert [schedule.start(k) for k in range(3)] == [1_000, 1_500, 2_000]
@@ -0,0 +1,73 @@
+import json
+import os
+import numpy as np
+from segments import Clip
+from sync import MISSING, SYNC_MANIFEST, FrameSynchronizer, align, load_alignment
+
+
+def test_align_matches_the_nearest_frame():
+    reference = [0, 100, 200, 300]
+    other = [10, 95, 260, 305, 400]
+    index = align([reference, other], tolerance_ns=20, reference=0)
+    np.testing.assert_array_equal(index["timestamp"], reference)
+    np.testing.assert_array_equal(index["frames"][:, 0], [0, 1, 2, 3])
+    # 200 is 60 ns from the closest frame, further than the tolerance
+    np.testing.assert_array_equal(index["frames"][:, 1], [0, 1, MISSING, 3])
+
+
+def test_align_uses_the_shortest_camera_and_half_a_frame_by_default():
+    slow = np.arange(0, 1000, 100)
+    fast = np.arange(0, 1000, 30)
+    index = align([fast, slow])
+    assert len(index) == len(slow)
+    assert np.all(index["frames"] != MISSING)
+    matched = fast[index["frames"][:, 0]]
+    assert np.all(np.abs(matched - slow) <= 50)
+
+
+def test_align_with_an_empty_camera():
+    index = align([[0, 100], []], reference=0)
+    np.testing.assert_array_equal(index["frames"][:, 1], [MISSING, MISSING])
+
+
+def closed_clip(path, name, index, timestamps):
+    clip = Clip(None, os.path.join(path, name), index=index)
+    for timestamp in timestamps:
+        clip.timestamps[clip.frames] = timestamp
+        clip.frames += 1
+    return clip
+
+
+def read_manifest(path):
+    with open(os.path.join(path, SYNC_MANIFEST)) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_synchronizer_pairs_clips_by_index(tmp_path):
+    sync = FrameSynchronizer(str(tmp_path), 2)
+    sync.clip_closed(0, closed_clip(tmp_path, "cam0_000.raw", 0, [0, 100]))
+    sync.clip_closed(0, closed_clip(tmp_path, "cam0_001.raw", 1, [200, 300]))
+    sync.clip_closed(1, closed_clip(tmp_path, "cam1_000.raw", 0, [5, 105]))
+    # cam1 got no frame in clip 1, its clip 2 tells that clip 1 is missing
+    sync.clip_closed(1, closed_clip(tmp_path, "cam1_001.raw", 2, [405, 505]))
+    sync.clip_closed(0, closed_clip(tmp_path, "cam0_002.raw", 2, [400, 500]))
+
+    entries = read_manifest(tmp_path)
+    assert [entry["clip"] for entry in entries] == [0, 1, 2]
+    assert [entry["files"] for entry in entries] == [
+        ["cam0_000.raw", "cam1_000.raw"],
+        ["cam0_001.raw", None],
+        ["cam0_002.raw", "cam1_001.raw"],
+    ]
+    assert [entry["complete"] for entry in entries] == [2, 0, 2]
+    index = load_alignment(os.path.join(tmp_path, entries[1]["index"]))
+    np.testing.assert_array_equal(index["timestamp"], [200, 300])
+    np.testing.assert_array_equal(index["frames"][:, 1], [MISSING, MISSING])
+
+
+def test_flush_writes_the_sets_waiting_for_a_camera(tmp_path):
+    sync = FrameSynchronizer(str(tmp_path), 2)
+    sync.clip_closed(0, closed_clip(tmp_path, "cam0_000.raw", 0, [0, 100]))
+    assert not os.path.exists(os.path.join(tmp_path, SYNC_MANIFEST))
+    sync.flush()
+    assert [entry["files"] for entry in read_manifest(tmp_path)] == [["cam0_000.raw", None]]
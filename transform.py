@@ -0,0 +1,111 @@
+import cv2
+import numpy as np
+
+INTERPOLATIONS = {
+    "area": cv2.INTER_AREA,
+    "linear": cv2.INTER_LINEAR,
+    "nearest": cv2.INTER_NEAREST,
+}
+
+FLIP_RESIZE = "flip-resize"
+RESIZE_FLIP = "resize-flip"
+REMAP = "remap"
+DECIMATE = "decimate"
+AUTO = "auto"
+STRATEGIES = (AUTO, FLIP_RESIZE, RESIZE_FLIP, REMAP, DECIMATE)
+
+# scales the decimate strategy can serve by plain integer striding
+DECIMATION_STEPS = {0.5: 2, 0.25: 4}
+
+
+class FramePlan:
+    """
+    Precomputed geometry for the per-frame transform of a frame source.
+
+    The plan is built once from the source size and the scale, and owns the buffers the
+    frames are read, flipped and resized into, so the per-frame path neither allocates
+    nor queries the device.
+
+    Strategies:
+        flip-resize  flip at full resolution, then resize (the original behaviour)
+        resize-flip  resize first, then flip the smaller image
+        remap        flip and resize in a single cv2.remap with precomputed maps
+        decimate     integer striding for scale 0.5/0.25, nearest-neighbour quality
+        auto         resize-flip, the fastest strategy in bench/transform_bench.py
+    """
+
+    def __init__(self, src_size, scale=0.5, interpolation="linear", flip=1, strategy=AUTO):
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"Unknown interpolation {interpolation!r}, expected one of {tuple(INTERPOLATIONS)}")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown transform strategy {strategy!r}, expected one of {STRATEGIES}")
+        if strategy == DECIMATE and scale not in DECIMATION_STEPS:
+            raise ValueError(f"The decimate strategy only supports the scales {tuple(DECIMATION_STEPS)}")
+        if strategy == AUTO:
+            strategy = RESIZE_FLIP
+
+        self.src_size = (int(src_size[0]), int(src_size[1]))
+        self.scale = scale
+        self.size = (int(self.src_size[0] * scale), int(self.src_size[1] * scale))
+        self.interpolation = interpolation
+        self.flip = flip
+        self.strategy = strategy
+
+        width, height = self.src_size
+        out_width, out_height = self.size
+        self.frame = np.empty((height, width, 3), np.uint8)
+        self.out = np.empty((out_height, out_width, 3), np.uint8)
+        self.flipped = None
+        self.resized = None
+        self.maps = None
+
+        if strategy == FLIP_RESIZE:
+            self.flipped = np.empty((height, width, 3), np.uint8)
+        elif strategy == RESIZE_FLIP:
+            self.resized = np.empty((out_height, out_width, 3), np.uint8)
+        elif strategy == REMAP:
+            self.maps = self.build_maps()
+        self.apply = getattr(self, "apply_" + strategy.replace("-", "_"))
+
+    def matches(self, frame, scale) -> bool:
+        return self.scale == scale and frame.shape[:2] == self.frame.shape[:2]
+
+    def build_maps(self):
+        """
+        Method that computes the fixed-point remap tables sampling the source flipped and scaled.
+
+        :return: tuple: the two maps for cv2.remap
+        """
+        width, height = self.src_size
+        out_width, out_height = self.size
+        xs = (np.arange(out_width, dtype=np.float32) + 0.5) * (width / out_width) - 0.5
+        ys = (np.arange(out_height, dtype=np.float32) + 0.5) * (height / out_height) - 0.5
+        if self.flip in (1, -1): xs = (width - 1) - xs
+        if self.flip in (0, -1): ys = (height - 1) - ys
+        map_x, map_y = np.meshgrid(xs, ys)
+        return cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+
+    def apply_flip_resize(self, frame):
+        cv2.flip(frame, self.flip, dst=self.flipped)
+        cv2.resize(self.flipped, self.size, dst=self.out, interpolation=INTERPOLATIONS[self.interpolation])
+        return self.out
+
+    def apply_resize_flip(self, frame):
+        cv2.resize(frame, self.size, dst=self.resized, interpolation=INTERPOLATIONS[self.interpolation])
+        cv2.flip(self.resized, self.flip, dst=self.out)
+        return self.out
+
+    def apply_remap(self, frame):
+        # remap has no area mode, so area falls back to bilinear sampling
+        interpolation = cv2.INTER_NEAREST if self.interpolation == "nearest" else cv2.INTER_LINEAR
+        cv2.remap(frame, self.maps[0], self.maps[1], interpolation, dst=self.out)
+        return self.out
+
+    def apply_decimate(self, frame):
+        # samples like INTER_NEAREST whatever the interpolation setting
+        step = DECIMATION_STEPS[self.scale]
+        out_width, out_height = self.size
+        rows = slice(out_height * step - 1, None, -step) if self.flip in (0, -1) else slice(0, out_height * step, step)
+        cols = slice(out_width * step - 1, None, -step) if self.flip in (1, -1) else slice(0, out_width * step, step)
+        np.copyto(self.out, frame[rows, cols])
+        return self.out